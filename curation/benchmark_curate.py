@@ -0,0 +1,78 @@
+"""
+Harvard Library Historical Datasets Curation Benchmarks
+
+Times curation functions on the Trade Statistics inventory, tiled up to
+larger numbers of rows.
+
+Usage: python benchmark_curate.py [max_rows]
+"""
+import math
+import sys
+import time
+
+import pandas as pd
+
+import curate # local module
+
+# trade statistics inventory
+g_inventory_file = './trade_statistics_inventory.csv'
+
+# datafile description template
+g_datafile_description_template = 'File associated with data tables series:'
+
+# numbers of rows to benchmark
+g_sizes = [1581, 10000, 100000, 1000000]
+
+def scale_inventory(inventory_df, rows):
+    """
+    Tile an inventory to a given number of rows
+
+    Parameters
+    ----------
+    inventory_df : DataFrame
+    rows : int
+        Number of rows in the scaled inventory
+
+    Return
+    ------
+    DataFrame
+    """
+    copies = math.ceil(rows / len(inventory_df))
+    df = pd.concat([inventory_df] * copies, ignore_index=True)
+    return df.iloc[:rows]
+
+def benchmark_create_datafile_metadata(inventory_df, sizes):
+    """
+    Time 'curate.create_datafile_metadata' for each inventory size
+
+    Parameters
+    ----------
+    inventory_df : DataFrame
+    sizes : list
+        List of numbers of rows
+
+    Return
+    ------
+    DataFrame
+        One row per size, with elapsed time and rows per second
+    """
+    results = []
+    for rows in sizes:
+        df = scale_inventory(inventory_df, rows)
+        start = time.perf_counter()
+        curate.create_datafile_metadata(df, g_datafile_description_template)
+        elapsed = time.perf_counter() - start
+        results.append({'function':'create_datafile_metadata',
+                        'rows':rows,
+                        'seconds':elapsed,
+                        'rows_per_second':rows / elapsed})
+    return pd.DataFrame.from_records(results)
+
+if __name__ == '__main__':
+    sizes = g_sizes
+    if (len(sys.argv) > 1):
+        sizes = [size for size in g_sizes if size <= int(sys.argv[1])]
+    inventory_df = pd.read_csv(g_inventory_file, index_col=None, low_memory=False)
+    print(benchmark_create_datafile_metadata(inventory_df, sizes).to_string(index=False))
+
+# end file
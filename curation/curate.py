@@ -7,11 +7,23 @@ dataset creation, and upload of datafiles.
 Intended to demonstrate pilot of Historic Datasets curation strategy that creates one dataset 
 per table series.
 """
+import functools
 import json
 import numpy as np
 import pandas as pd
-from pyDataverse.models import Dataset
-import requests
+import re
+
+# note: pyDataverse and requests are imported within the functions that use them,
+# so that importing this module stays fast
+
+# datafile mimetypes, keyed on file type
+MIMETYPES = {
+    'image':'image/jpeg',
+    'alto':'application/xml',
+    'txt':'text/plain',
+    'csv':'text/csv',
+    'parquet':'application/vnd.apache.parquet'
+}
 
 def create_dataset_metadata(author, affiliation, contact, email, series_name, series_inventory):
     """
@@ -57,16 +69,27 @@ def create_dataset_metadata(author, affiliation, contact, email, series_name, se
             print('Error: One or more missing required fields in inventory')
             return {}
 
-    # get the index of the first file in the inventory
-    index = series_inventory.index.values[0]
-    
-    # collect metadata variables
-    dataset_title = series_inventory.at[index,'series_name']
-    volume_title = series_inventory.at[index,'volume_title']
-    volume_attribution = series_inventory.at[index,'attribution']
-    volume_author = series_inventory.at[index,'author']
-    creation_date = series_inventory.at[index,'creation_date']
-    keyword_str = series_inventory.at[index,'subjects']
+    # create metadata from the first file in the inventory
+    return _build_dataset_metadata(author, affiliation, contact, email, series_inventory.iloc[0])
+
+def _parse_keywords(keyword_str):
+    """
+    Parse a ';'-separated string of LCSH subjects into dataset keywords.
+    Results are cached since every series of a volume shares the same subjects.
+
+    Parameter
+    ---------
+    keyword_str : str
+
+    Return
+    ------
+    list
+        List of keyword dicts
+    """
+    return [dict(kw) for kw in _parse_keywords_cached(keyword_str)]
+
+@functools.lru_cache(maxsize=None)
+def _parse_keywords_cached(keyword_str):
     keywords = keyword_str.split(';')
     kws = []
     for kw in keywords:
@@ -75,11 +98,36 @@ def create_dataset_metadata(author, affiliation, contact, email, series_name, se
         d['keywordVocabulary'] = 'LCSH'
         d['keywordVocabularyURI'] = 'https://www.loc.gov/aba/cataloging/subject/'
         kws.append(d)
-    creation_date = '{}-01-01'.format(series_inventory.at[index,'creation_date'])
-    hollis_link = series_inventory.at[index,'permalink']
-    drs_link = series_inventory.at[index,'url']
-    subjects = ['Arts and Humanities','Business and Management']
-    data_source = [series_inventory.at[index,'url']]
+    return tuple(kws)
+
+def _build_dataset_metadata(author, affiliation, contact, email, row, title=None):
+    """
+    Build a dictionary of dataset metadata from the first row of a series inventory.
+    Assumes that parameters and inventory fields have already been validated.
+
+    Parameters
+    ----------
+    author : str
+    affiliation : str
+    contact : str
+    email : str
+    row : Series
+        First row of the series inventory
+    title : str (optional)
+        Dataset title (default: series name)
+
+    Return
+    ------
+    dict
+    """
+    # collect metadata variables
+    dataset_title = title if (title) else row['series_name']
+    volume_title = row['volume_title']
+    volume_author = row['author']
+    kws = _parse_keywords(row['subjects'])
+    creation_date = '{}-01-01'.format(row['creation_date'])
+    hollis_link = row['permalink']
+    data_source = [row['url']]
     description = '{} is a series of tables, images, and text files associated with: {}. Created by: {}'.format(dataset_title, volume_title, volume_author)
 
     # build the dataset metadata dictionary
@@ -100,34 +148,344 @@ def create_dataset_metadata(author, affiliation, contact, email, series_name, se
 
     return dataset_metadata
 
-def create_dataset(api, dataverse_url, dataset_metadata):
+def create_series_metadata(author, affiliation, contact, email, inventory_df):
     """
-    Create a dataverse dataset
+    Partition a volume inventory by series name in a single pass and
+    create the dataset metadata for each series.
 
     Parameters
     ----------
-    api : pyDataverse API
-    dataverse : str
-        Name of dataverse collection url (e.g., https://demo.dataverse.org/dataverse/histd)
-    dataset_metadata : dict
-        Dictionary of dataset metadata values
+    author : str
+        Dataset author name
+    affiliation : str
+        Dataset athor affiliation
+    contact : str
+        Dataset contact name (may be same as author)
+    email : str
+        Dataset contact email address
+    inventory_df : DataFrame
+        DataFrame containing file metadata for all series
 
     Return
     ------
-    dict: 
-        {status: bool, dataset_id: int, dataset_pid: str}
+    tuple
+        (dict of series inventories, dict of dataset metadata), both keyed on
+        series name in order of first appearance in the inventory
+    """
+    # validate parameters
+    if ((not author) or
+        (not affiliation) or
+        (not contact) or
+        (not email) or
+        (inventory_df.empty == True)):
+            print('Error: One or more invalid parameter values')
+            return {}, {}
+
+    # check the inventory for required fields
+    required = ['series_name','volume_title','attribution','author',
+                'subjects','creation_date','url','permalink']
+    if (not set(required).issubset(inventory_df.columns)):
+            print('Error: One or more missing required fields in inventory')
+            return {}, {}
 
+    # partition the inventory and create metadata from the first row of each series
+    series_inventories = {}
+    dataset_metadata = {}
+    for series_name, series_inventory in inventory_df.groupby('series_name', sort=False):
+        series_inventories[series_name] = series_inventory
+        dataset_metadata[series_name] = _build_dataset_metadata(author, affiliation, contact, email,
+                                                                series_inventory.iloc[0])
+
+    return series_inventories, dataset_metadata
+
+# volume-level inventory columns (the same for every file of a volume)
+VOLUME_COLUMNS = ['volume_title','attribution','author','published','notes',
+                  'subjects','creation_date','record_id','permalink']
+
+# series-level inventory columns (series are identified by series_name; the other
+# columns are moved to the series table only if they are the same for every file of a series)
+SERIES_COLUMNS = ['series_name','series_type','series_num']
+
+def normalize_inventory(inventory_df):
+    """
+    Split a wide inventory, which repeats the volume and series metadata on
+    every row, into volume, series, and file tables linked by keys:
+    files.series_id -> series.series_id, series.volume_id -> volumes.volume_id
+
+    Parameter
+    ---------
+    inventory_df : DataFrame
+        Wide inventory (e.g., trade_statistics_inventory.csv)
+
+    Return
+    ------
+    dict
+        {volumes: DataFrame, series: DataFrame, files: DataFrame}
+        The files table is indexed like the inventory
+    """
+    # check for empty inventory
+    if (inventory_df.empty == True):
+        return {}
+
+    volume_columns = [c for c in VOLUME_COLUMNS if c in inventory_df.columns]
+
+    # volume and series keys (in order of first appearance)
+    volume_ids = inventory_df.groupby(volume_columns, sort=False, dropna=False).ngroup()
+    keys = pd.concat([volume_ids.rename('volume_id'), inventory_df['series_name']], axis=1)
+    series_ids = keys.groupby(['volume_id','series_name'], sort=False, dropna=False).ngroup()
+
+    # series columns that are the same for every file of each series
+    series_columns = ['series_name']
+    for column in [c for c in SERIES_COLUMNS[1:] if c in inventory_df.columns]:
+        if ((inventory_df[column].groupby(series_ids, dropna=False).nunique(dropna=False) <= 1).all()):
+            series_columns.append(column)
+    keys = pd.concat([volume_ids.rename('volume_id'), inventory_df[series_columns]], axis=1)
+
+    # one row per volume and per series
+    first_rows = ~volume_ids.duplicated()
+    volumes = inventory_df.loc[first_rows, volume_columns].assign(volume_id=volume_ids[first_rows])
+    volumes = volumes[['volume_id'] + volume_columns].reset_index(drop=True)
+    first_rows = ~series_ids.duplicated()
+    series = keys.loc[first_rows].assign(series_id=series_ids[first_rows])
+    series = series[['series_id','volume_id'] + series_columns].reset_index(drop=True)
+
+    # slim file table
+    files = inventory_df.drop(columns=volume_columns + series_columns).assign(series_id=series_ids)
+
+    return {'volumes':volumes, 'series':series, 'files':files}
+
+def denormalize_inventory(tables, columns=None, files_df=None):
+    """
+    Join the normalized volume, series, and file tables (see 'normalize_inventory')
+    back into a wide inventory. Only the requested volume and series columns are joined.
+
+    Parameters
+    ----------
+    tables : dict
+        Output of call to 'normalize_inventory' or 'read_normalized_inventory'
+    columns : list (optional)
+        Volume and series columns to join (default: all)
+    files_df : DataFrame (optional)
+        Subset of the file table to join (default: all files)
+
+    Return
+    ------
+    DataFrame
+        Indexed like the file table
+    """
+    files = tables.get('files') if (files_df is None) else files_df
+    series = tables.get('series').set_index('series_id')
+    volumes = tables.get('volumes').set_index('volume_id')
+    if (columns is None):
+        columns = list(series.columns.drop('volume_id')) + list(volumes.columns)
+
+    # join the requested series columns, then the requested volume columns
+    series_columns = [c for c in columns if c in series.columns]
+    volume_columns = [c for c in columns if c in volumes.columns]
+    series = series[['volume_id'] + series_columns]
+    if (len(volume_columns) > 0):
+        series = series.join(volumes[volume_columns], on='volume_id')
+    df = files.join(series.drop(columns=['volume_id']), on='series_id')
+    return df
+
+def write_normalized_inventory(tables, directory):
+    """
+    Write the normalized inventory tables to volumes.csv, series.csv and files.csv
+
+    Parameters
+    ----------
+    tables : dict
+        Output of call to 'normalize_inventory'
+    directory : str
+        Output directory
+
+    Return
+    ------
+    bool
+    """
+    if ((not tables) or
+        (not directory)):
+        return False
+    for name in ['volumes','series','files']:
+        tables.get(name).to_csv('{}/{}.csv'.format(directory, name), index=False)
+    return True
+
+def read_normalized_inventory(directory):
+    """
+    Read the normalized inventory tables written by 'write_normalized_inventory'
+
+    Parameter
+    ---------
+    directory : str
+        Directory of volumes.csv, series.csv and files.csv
+
+    Return
+    ------
+    dict
+        {volumes: DataFrame, series: DataFrame, files: DataFrame}
+    """
+    tables = {}
+    for name in ['volumes','series','files']:
+        tables[name] = pd.read_csv('{}/{}.csv'.format(directory, name), index_col=None, low_memory=False)
+    return tables
+
+def create_normalized_series_metadata(author, affiliation, contact, email, tables):
+    """
+    Create the dataset metadata for each series of a normalized inventory,
+    reading one series row and one volume row per series. Series of different
+    volumes may share a name, so the results are keyed on series id, and the
+    dataset titles of an inventory of several volumes include the volume title
+    (and the volume id, if volume titles are repeated).
+
+    Parameters
+    ----------
+    author : str
+        Dataset author name
+    affiliation : str
+        Dataset athor affiliation
+    contact : str
+        Dataset contact name (may be same as author)
+    email : str
+        Dataset contact email address
+    tables : dict
+        Output of call to 'normalize_inventory' or 'read_normalized_inventory'
+
+    Return
+    ------
+    tuple
+        (dict of series file inventories, dict of dataset metadata), both keyed on
+        series id. The file inventories are slim file tables with a series_name column.
     """
     # validate parameters
-    if ((not api) or
-        (not dataset_metadata)):
-        return {
-            'status':False, 
-            'dataset_id':-1, 
-            'dataset_pid':''
-        }
+    if ((not author) or
+        (not affiliation) or
+        (not contact) or
+        (not email) or
+        (not tables)):
+            print('Error: One or more invalid parameter values')
+            return {}, {}
 
-    # create the pyDataverse dataset model
+    # check the tables for required fields
+    if ((not set(['series_id','volume_id','series_name']).issubset(tables.get('series').columns)) or
+        (not set(['volume_id','volume_title','author','subjects','creation_date','permalink']).issubset(tables.get('volumes').columns)) or
+        (not set(['series_id','url']).issubset(tables.get('files').columns))):
+            print('Error: One or more missing required fields in inventory')
+            return {}, {}
+
+    # one row per series, with its volume metadata and the url of its first file
+    files = tables.get('files')
+    series = denormalize_inventory(tables, columns=VOLUME_COLUMNS,
+                                   files_df=tables.get('series')[['series_id']]).set_index('series_id')
+    series = series.join(tables.get('series').set_index('series_id')['series_name'])
+    series = series.join(files.groupby('series_id', sort=False)['url'].first())
+
+    # dataset titles, unique across volumes
+    titles = series['series_name'].astype(str)
+    if (tables.get('volumes')['volume_id'].nunique() > 1):
+        titles = titles + ' (' + series['volume_title'].astype(str) + ')'
+        volume_ids = tables.get('series').set_index('series_id')['volume_id'].reindex(series.index)
+        repeated = titles.duplicated(keep=False)
+        titles = titles.where(~repeated, titles.str[:-1] + ', volume ' + volume_ids.astype(str) + ')')
+
+    # partition the file table and create metadata from each series row
+    series_inventories = {}
+    dataset_metadata = {}
+    for series_id, series_files in files.groupby('series_id', sort=False):
+        row = series.loc[series_id]
+        series_inventories[series_id] = series_files.assign(series_name=row['series_name'])
+        dataset_metadata[series_id] = _build_dataset_metadata(author, affiliation, contact, email, row,
+                                                              title=titles[series_id])
+
+    return series_inventories, dataset_metadata
+
+def create_series_batches(series_inventories, batch_size=5, data_directory=None, size_column=None):
+    """
+    Group series into batches of (approximately) equal total bytes and file
+    counts, so that uploads of image-heavy series are spread across batches.
+
+    File sizes are read from the inventory column 'size_column' if supplied,
+    otherwise from a single scan of 'data_directory' (files not found count
+    as 0 bytes). Series are assigned largest first to the batch with the
+    smallest combined share of bytes and files.
+
+    Parameters
+    ----------
+    series_inventories : dict
+        Series inventories keyed on series name (e.g., from 'create_series_metadata')
+    batch_size : int (default: 5)
+        Number of series per batch, on average (at least one batch)
+    data_directory : str (optional)
+        Directory where datafiles are kept
+    size_column : str (optional)
+        Inventory column of file sizes in bytes
+
+    Raise
+    -----
+    ValueError
+        Neither data_directory nor size_column supplied
+
+    Return
+    ------
+    list
+        List of batches (lists of series names), largest batch first
+    """
+    # validate parameters
+    if (not series_inventories):
+        return []
+    if ((not data_directory) and
+        (not size_column)):
+        raise ValueError('Either data_directory or size_column is required')
+
+    import heapq
+    import os
+
+    # get the file sizes from a single scan of the data directory
+    sizes = {}
+    if (not size_column):
+        with os.scandir(data_directory) as entries:
+            for entry in entries:
+                if (entry.is_file()):
+                    sizes[entry.name] = entry.stat().st_size
+
+    # total bytes and number of files per series
+    totals = []
+    for series_name, series_inventory in series_inventories.items():
+        if (size_column):
+            nbytes = int(series_inventory[size_column].fillna(0).sum())
+        else:
+            nbytes = int(series_inventory['filename_osn'].map(sizes).fillna(0).sum())
+        totals.append((nbytes, len(series_inventory), series_name))
+    all_bytes = max(sum([t[0] for t in totals]), 1)
+    all_files = max(sum([t[1] for t in totals]), 1)
+
+    # assign the largest series first to the least loaded batch
+    num_batches = max(1, len(totals) // batch_size)
+    heap = [(0.0, i) for i in range(num_batches)]
+    batches = [{'bytes':0, 'series':[]} for i in range(num_batches)]
+    for nbytes, nfiles, series_name in sorted(totals, key=lambda t: (t[0], t[1]), reverse=True):
+        load, i = heapq.heappop(heap)
+        batches[i]['bytes'] = batches[i]['bytes'] + nbytes
+        batches[i]['series'].append(series_name)
+        heapq.heappush(heap, (load + nbytes / all_bytes + nfiles / all_files, i))
+
+    # largest batches first
+    batches = sorted(batches, key=lambda b: b['bytes'], reverse=True)
+    return [b['series'] for b in batches if (len(b['series']) > 0)]
+
+def _build_dataset(dataset_metadata):
+    """
+    Create a pyDataverse dataset model from dataset metadata
+
+    Parameter
+    ---------
+    dataset_metadata : dict
+        Dictionary of dataset metadata values
+
+    Return
+    ------
+    pyDataverse Dataset
+    """
+    from pyDataverse.models import Dataset
     ds = Dataset()
     # populate the dataset model with metadata values
     ds.title = dataset_metadata.get('title')
@@ -140,51 +498,280 @@ def create_dataset(api, dataverse_url, dataset_metadata):
     ds.keyword = dataset_metadata.get('keywords')
     ds.dataSources = dataset_metadata.get('data_source')
     ds.distributionDate = dataset_metadata.get('creation_date')
+    return ds
 
-    # use pyDataverse to ensure that the metadata is valid
-    if (ds.validate_json() == False):
-        return {
-            'status':False, 
-            'dataset_id':-1, 
-            'dataset_pid':''
-        }
+@functools.lru_cache(maxsize=None)
+def _dataset_validator():
+    """
+    Load and compile the pyDataverse dataset JSON schema (once)
 
-    # 
-    # create the dataset via the dataverse api
-    #
+    Return
+    ------
+    jsonschema validator
+    """
+    import os
+    import jsonschema
+    import pyDataverse.models
+    filename = os.path.join(os.path.dirname(os.path.realpath(pyDataverse.models.__file__)),
+                            pyDataverse.models.Dataset()._default_json_schema_filename)
+    with open(filename) as fp:
+        schema = json.loads(fp.read())
+    validator = jsonschema.validators.validator_for(schema)
+    validator.check_schema(schema)
+    return validator(schema)
 
-    # get the base url
-    base_url = api.base_url
-    # get the api token
-    api_token = api.api_token
-    # dataverse collection url 
-    dataverse_url = dataverse_url
-    # create the headers
-    headers = {'X-Dataverse-key': api_token, 'Content-Type' : 'application/json'}
+def _post_dataset(session, base_url, dataverse_url, dataset_json, title):
+    """
+    Create a dataverse dataset from its JSON metadata
+
+    Parameters
+    ----------
+    session : requests.Session
+        With the X-Dataverse-key header
+    base_url : str
+        Dataverse installation url (e.g., https://demo.dataverse.org)
+    dataverse_url : str
+        Name of dataverse collection (e.g., histd)
+    dataset_json : str
+        Output of call to pyDataverse Dataset.json()
+    title : str
+        Dataset title, for error messages
+
+    Return
+    ------
+    dict: 
+        {status: bool, dataset_id: int, dataset_pid: str}
+    """
     # create the request url
     request_url = '{}/api/dataverses/{}/datasets'.format(base_url, dataverse_url)
-
-    # call the requests library using the request url
-    response = requests.post(request_url, headers=headers, data=ds.json())
+    response = session.post(request_url, headers={'Content-Type':'application/json'}, data=dataset_json)
     # get the status and message from the response
     status = int(response.status_code)
 
     # handle http responses
     if (not ((status >= 200) and
         (status < 300))):
-        print('Error: {} - failed to create dataset {}'.format(status, dataset_metadata.get('title')))
+        print('Error: {} - failed to create dataset {}'.format(status, title))
         return {
             'status':False, 
             'dataset_id':-1, 
             'dataset_pid':''
         }
     # if success
+    data = response.json().get('data')
     return {
         'status':True, 
-        'dataset_id':response.json().get('data').get('id'),
-        'dataset_pid':response.json().get('data').get('persistentId')     
+        'dataset_id':data.get('id'),
+        'dataset_pid':data.get('persistentId')     
     }
 
+def _get_dataset_titles(session, base_url, dataverse_url, max_workers=8):
+    """
+    Get the titles of the datasets in a dataverse collection
+    (from the latest version of each dataset, including drafts)
+
+    Parameters
+    ----------
+    session : function
+        Returns a requests.Session for the calling thread
+    base_url : str
+        Dataverse installation url (e.g., https://demo.dataverse.org)
+    dataverse_url : str
+        Name of dataverse collection (e.g., histd)
+    max_workers : int (default: 8)
+        Maximum number of concurrent requests
+
+    Raise
+    -----
+    RuntimeError
+        Unexpected response from dataverse API
+
+    Return
+    ------
+    dict
+        Keyed on title: {dataset_id: int, dataset_pid: str}
+    """
+    import concurrent.futures
+
+    request_url = '{}/api/dataverses/{}/contents'.format(base_url, dataverse_url)
+    response = session().get(request_url)
+    if (response.status_code != 200):
+        msg = 'Response has status code {} for url: {}'.format(response.status_code, request_url)
+        raise RuntimeError(msg)
+    datasets = [item for item in response.json().get('data') if (item.get('type') == 'dataset')]
+
+    # get the title of each dataset's latest version
+    def get_title(dataset):
+        request_url = '{}/api/datasets/{}/versions/:latest'.format(base_url, dataset.get('id'))
+        response = session().get(request_url)
+        if (response.status_code != 200):
+            msg = 'Response has status code {} for url: {}'.format(response.status_code, request_url)
+            raise RuntimeError(msg)
+        fields = response.json().get('data').get('metadataBlocks').get('citation').get('fields')
+        titles = [field.get('value') for field in fields if (field.get('typeName') == 'title')]
+        return titles[0] if (titles) else None
+
+    titles = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for dataset, title in zip(datasets, executor.map(get_title, datasets)):
+            titles[title] = {
+                'dataset_id':dataset.get('id'),
+                'dataset_pid':'{}:{}/{}'.format(dataset.get('protocol'), dataset.get('authority'), dataset.get('identifier'))
+            }
+    return titles
+
+def create_dataset(api, dataverse_url, dataset_metadata):
+    """
+    Create a dataverse dataset (to create many datasets, see 'create_datasets')
+
+    Parameters
+    ----------
+    api : pyDataverse API
+    dataverse : str
+        Name of dataverse collection url (e.g., https://demo.dataverse.org/dataverse/histd)
+    dataset_metadata : dict
+        Dictionary of dataset metadata values
+
+    Return
+    ------
+    dict: 
+        {status: bool, dataset_id: int, dataset_pid: str}
+
+    """
+    # validate parameters
+    if ((not api) or
+        (not dataset_metadata)):
+        return {
+            'status':False, 
+            'dataset_id':-1, 
+            'dataset_pid':''
+        }
+
+    # create the pyDataverse dataset model
+    ds = _build_dataset(dataset_metadata)
+
+    # use pyDataverse to ensure that the metadata is valid
+    if (ds.validate_json() == False):
+        return {
+            'status':False, 
+            'dataset_id':-1, 
+            'dataset_pid':''
+        }
+
+    # 
+    # create the dataset via the dataverse api
+    #
+    import requests
+    session = requests.Session()
+    session.headers.update({'X-Dataverse-key':api.api_token})
+    return _post_dataset(session, api.base_url, dataverse_url, ds.json(), dataset_metadata.get('title'))
+
+def create_datasets(api, dataverse_url, dataset_metadata, max_workers=8):
+    """
+    Create dataverse datasets for many series, e.g., the output of
+    'create_series_metadata'. All metadata is validated first (against a
+    schema compiled once), then the datasets are created concurrently.
+    Datasets whose titles already exist in the collection are not created
+    again, so the call can be repeated after a partial failure.
+
+    Parameters
+    ----------
+    api : pyDataverse API
+    dataverse_url : str
+        Name of dataverse collection (e.g., histd)
+    dataset_metadata : dict
+        Dictionary of dataset metadata dicts, keyed on series name
+    max_workers : int (default: 8)
+        Maximum number of concurrent requests
+
+    Raise
+    -----
+    RuntimeError
+        Unexpected response listing the existing datasets
+
+    Return
+    ------
+    dict
+        Keyed on series name:
+        {status: bool, dataset_id: int, dataset_pid: str, existing: bool}
+    """
+    # validate parameters
+    if ((not api) or
+        (not dataset_metadata)):
+        return {}
+
+    import concurrent.futures
+    import requests
+    import threading
+
+    # validate all metadata before creating any dataset
+    validator = _dataset_validator()
+    results = {}
+    pending = {}
+    for series_name, metadata in dataset_metadata.items():
+        ds_json = _build_dataset(metadata).json(validate=False)
+        error = next(validator.iter_errors(json.loads(ds_json)), None)
+        if (error is not None):
+            print('Error: invalid metadata for dataset {}: {}'.format(metadata.get('title'), error.message))
+            results[series_name] = {'status':False, 'dataset_id':-1, 'dataset_pid':'', 'existing':False}
+        else:
+            pending[series_name] = ds_json
+
+    # one session per thread (requests sessions are not thread-safe)
+    local = threading.local()
+    def get_session():
+        if (not hasattr(local, 'session')):
+            local.session = requests.Session()
+            local.session.headers.update({'X-Dataverse-key':api.api_token})
+        return local.session
+
+    # reuse existing datasets, matched on title
+    existing = _get_dataset_titles(get_session, api.base_url, dataverse_url, max_workers=max_workers)
+    titles = {}
+    for series_name in list(pending.keys()):
+        title = dataset_metadata[series_name].get('title')
+        if (title in existing):
+            results[series_name] = dict(existing[title], status=True, existing=True)
+            del pending[series_name]
+        elif (title in titles):
+            # same title twice in this call: create it once
+            titles[title].append(series_name)
+            del pending[series_name]
+        else:
+            titles[title] = [series_name]
+
+    # create the other datasets
+    def create(series_name):
+        return _post_dataset(get_session(), api.base_url, dataverse_url,
+                             pending[series_name], dataset_metadata[series_name].get('title'))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for series_name, result in zip(pending.keys(), executor.map(create, pending.keys())):
+            for name in titles[dataset_metadata[series_name].get('title')]:
+                results[name] = dict(result, existing=(name != series_name))
+
+    # in the order of the input
+    return {series_name:results[series_name] for series_name in dataset_metadata.keys()}
+
+def _serialize_tags(values, to_tags):
+    """
+    Serialize the tags derived from each value of a Series as the
+    comma-separated items of a JSON list. Each distinct value is
+    serialized only once.
+
+    Parameters
+    ----------
+    values : Series
+    to_tags : function
+        Returns the list of tags for a value
+
+    Return
+    ------
+    Series
+    """
+    unique = values.drop_duplicates()
+    serialized = [json.dumps(to_tags(val))[1:-1] for val in unique]
+    return values.map(pd.Series(serialized, index=unique.values))
+
 def create_datafile_metadata(inventory_df, template):
     """
     Create metadata for open metadata project datafiles based upon a template
@@ -200,6 +787,7 @@ def create_datafile_metadata(inventory_df, template):
     Return
     -------
     DataFrame
+        Indexed like inventory_df
     """
 
     # validate parameters
@@ -224,91 +812,309 @@ def create_datafile_metadata(inventory_df, template):
         print('Error: One or more missing required fields in inventory')
         return pd.DataFrame()
 
-    # create an inventory
-    df = pd.DataFrame()
+    # create an inventory aligned with the input index
+    df = pd.DataFrame(index=inventory_df.index)
+    # note: inventories may hold file types as categoricals, which cannot take new values
+    file_types = inventory_df['file_type'].astype(object)
+    is_csv = (file_types == 'csv')
 
-    #
-    # prepare series of values to add to metadata dataframe
-    #
+    # file name and type
+    df['filename_osn'] = inventory_df['filename_osn']
+    df['file_type'] = file_types
 
-    # prepare file name
-    all_filenames = []
-    # prepare file types
-    all_file_types = []
-    # prepare datafile descriptions
-    all_descriptions = []
-    # prepare datafile tags
-    all_tags = []
-    # prepare mimetypes
-    all_mime_types = []
-    # test variable
-    all_test = []
-
-    counter = 0
-
-    # iterate through through the inventory and create datafile metadata
-    for row in inventory_df.iterrows():
-        # get inventory variables
-        filename = row[1].get('filename_osn')
-        all_filenames.append(filename)
-        series_name = row[1].get('series_name')
-        all_test.append(row[1].get('filename_osn')) # test the series functionality
-        file_type = row[1].get('file_type')
-        all_file_types.append(file_type)
-        file_tags = ['Data'] # tags for this particular file, init with 'Data'
-
-        # get file entities
-        entities = []
-        val = row[1].get('entities')
-        # ignore files with no entities
-        if (not val is np.nan):
-            entities = entities + str(val).split(';')
-        # add entities to file tags
-        file_tags = file_tags + entities
-
-        # set file mimetype
-        if (file_type == 'image'):
-            all_mime_types.append('image/jpeg')
-        elif (file_type == 'alto'):
-            all_mime_types.append('application/xml')
-        elif (file_type == 'txt'):
-            all_mime_types.append('text/plain')        
-        elif (file_type == 'csv'):
-            all_mime_types.append('text/csv')
-        else:
-            all_mime_types.append('UNKNOWN')             
-
-        # handle csv files
-        if (file_type == 'csv'):
-            title = row[1].get('table_title')
-            if (title is np.nan):
-                title = row[1].get('table_type')
-            # table title for csv files serve as descriptions
-            all_descriptions.append(title)
-            file_tags.append('Table Type:{}'.format(row[1].get('table_type')))
-            file_tags.append('Multilevel Columns:{}'.format(row[1].get('multilevel_columns')))
-            file_tags.append('Multilevel Rows:{}'.format(row[1].get('multilevel_rows')))
-            file_tags.append('Computation Ready:{}'.format(row[1].get('computation_ready')))
-        else:
-            # set description
-            desc = template + ' ' + series_name
-            all_descriptions.append(desc)
-
-        # serialize the file tags
-        all_tags.append(json.dumps(file_tags))
-        counter = counter + 1
-
-    # Add columns to the dataframe
-    df['filename_osn'] = pd.Series(all_filenames)
-    df['file_type'] = pd.Series(all_file_types)
-    df['description'] = pd.Series(all_descriptions)
-    df['mimetype'] = pd.Series(all_mime_types)
-    df['tags'] = pd.Series(all_tags)
-    df['test'] = pd.Series(all_test)
+    # table titles serve as descriptions for csv files (table type if no title),
+    # other files are described by the template and series name
+    titles = inventory_df['table_title'].where(inventory_df['table_title'].notna(), inventory_df['table_type'])
+    df['description'] = titles.where(is_csv, template + ' ' + inventory_df['series_name'])
+
+    # set file mimetype
+    df['mimetype'] = file_types.map(MIMETYPES).fillna('UNKNOWN')
+
+    # file tags, serialized as a json list: 'Data', entities, then table tags for csv files
+    entities = inventory_df['entities']
+    entity_tags = _serialize_tags(entities, lambda val: str(val).split(';'))
+    entity_tags = (', ' + entity_tags).where(entities.notna(), '')
+    table_tags = ', ' + _serialize_tags(inventory_df['table_type'], lambda val: ['Table Type:{}'.format(val)])
+    table_tags = table_tags + ', ' + _serialize_tags(inventory_df['multilevel_columns'], lambda val: ['Multilevel Columns:{}'.format(val)])
+    table_tags = table_tags + ', ' + _serialize_tags(inventory_df['multilevel_rows'], lambda val: ['Multilevel Rows:{}'.format(val)])
+    table_tags = table_tags + ', ' + _serialize_tags(inventory_df['computation_ready'], lambda val: ['Computation Ready:{}'.format(val)])
+    table_tags = table_tags.where(is_csv, '')
+    df['tags'] = '["Data"' + entity_tags + table_tags + ']'
 
     return df
 
-def direct_upload_datafiles(api, dataverse_url, dataset_pid, data_directory, metadata_df):
+def _normalize_header(columns):
+    """
+    Normalize the column names of a vendor table: lower case, with runs of
+    spaces and punctuation replaced by underscores; unnamed columns are
+    numbered and repeated names are suffixed (e.g., value, value_2)
+
+    Parameter
+    ---------
+    columns : list
+
+    Return
+    ------
+    list
+    """
+    names = []
+    for i, column in enumerate(columns):
+        name = str(column)
+        if (name.startswith('Unnamed:')):
+            name = ''
+        name = re.sub(r'[\W_]+', '_', name.lower()).strip('_')
+        if (not name):
+            name = 'column_{}'.format(i + 1)
+        base = name
+        count = 1
+        while (name in names):
+            count = count + 1
+            name = '{}_{}'.format(base, count)
+        names.append(name)
+    return names
+
+def _read_table(filepath):
+    """
+    Read a vendor csv table as strings, with normalized column names
+
+    Parameter
+    ---------
+    filepath : str
+
+    Return
+    ------
+    tuple
+        (DataFrame or None, error message)
+    """
+    try:
+        df = pd.read_csv(filepath, dtype=str, skip_blank_lines=True)
+    except (OSError, ValueError) as error:
+        return None, '{}: {}'.format(type(error).__name__, error)
+    df.columns = _normalize_header(df.columns)
+    return df, ''
+
+def _to_numeric(values):
+    """
+    Convert a column of strings to numbers, if every value is a number
+    (thousands separators are ignored)
+
+    Parameter
+    ---------
+    values : Series
+
+    Return
+    ------
+    Series
+    """
+    numbers = pd.to_numeric(values.str.replace(',', '', regex=False).str.strip(), errors='coerce')
+    if (numbers.notna().sum() != values.notna().sum()):
+        return values
+    return numbers
+
+def consolidate_series_tables(series_inventories, data_directory, output_directory,
+                              file_format='parquet', max_workers=8):
+    """
+    Consolidate the computation-ready csv tables of each series into one file
+    per series, so that a series can be analyzed with one read instead of one
+    per table. The tables are read in parallel and their column names are
+    normalized (see '_normalize_header'); tables with different columns are
+    aligned on the union of their columns. Columns whose values are all numbers
+    are stored as numbers. Each row records its source: drs_id, filename_osn and
+    the row number within the source table (source_row).
+
+    Parameters
+    ----------
+    series_inventories : dict
+        DataFrames of files, keyed on series name (see 'create_series_metadata')
+    data_directory : str
+        Directory where datafiles are kept
+    output_directory : str
+        Directory of the consolidated files (e.g., data_directory, to upload
+        them alongside the original tables)
+    file_format : str (default: 'parquet')
+        'parquet' (requires pyarrow or fastparquet) or 'csv'
+    max_workers : int (default: 8)
+        Maximum number of tables read concurrently
+
+    Raise
+    -----
+    ValueError
+        Unsupported file format
+    ImportError
+        Neither pyarrow nor fastparquet is installed (Parquet output)
+
+    Return
+    ------
+    DataFrame
+        One row per series: series_name, filename (numbered by the position of
+        the series, e.g., '001_trade_returns.parquet'; None if the series has no
+        computation-ready tables), tables, rows, columns, and errors (source
+        files that could not be read, separated by ;)
+    """
+    import concurrent.futures
+    import os
+
+    columns = ['series_name', 'filename', 'tables', 'rows', 'columns', 'errors']
+    if (not file_format in ['parquet', 'csv']):
+        raise ValueError('Unsupported file format: {}'.format(file_format))
+    if (file_format == 'parquet'):
+        import importlib.util
+        if ((importlib.util.find_spec('pyarrow') is None) and
+            (importlib.util.find_spec('fastparquet') is None)):
+            raise ImportError("Parquet output requires pyarrow or fastparquet (pip install pyarrow), or use file_format='csv'")
+    if (not series_inventories):
+        return pd.DataFrame(columns=columns)
+
+    # computation-ready csv tables of each series
+    tables = {}
+    for series_name, series_inventory in series_inventories.items():
+        if ((not 'computation_ready' in series_inventory.columns) or
+            (not 'file_type' in series_inventory.columns)):
+            tables[series_name] = pd.DataFrame(columns=['drs_id', 'filename_osn'])
+            continue
+        ready = series_inventory['computation_ready'].astype(str).str.lower() == 'true'
+        tables[series_name] = series_inventory.loc[ready & (series_inventory['file_type'] == 'csv'),
+                                                   ['drs_id', 'filename_osn']]
+
+    # read all the tables at once
+    filenames = pd.concat(tables.values())['filename_osn'].drop_duplicates().tolist()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = dict(zip(filenames, executor.map(_read_table, [data_directory + '/' + f for f in filenames])))
+
+    # write one file per series
+    os.makedirs(output_directory, exist_ok=True)
+    rows = []
+    for position, (series_name, series_tables) in enumerate(tables.items(), start=1):
+        errors = []
+        frames = []
+        for drs_id, filename in zip(series_tables['drs_id'], series_tables['filename_osn']):
+            df, error = results[filename]
+            if (df is None):
+                errors.append('{} ({})'.format(filename, error))
+                continue
+            provenance = pd.DataFrame({'drs_id':str(drs_id), 'filename_osn':filename,
+                                       'source_row':range(1, len(df) + 1)}, index=df.index)
+            frames.append(pd.concat([provenance, df.drop(columns=provenance.columns, errors='ignore')], axis=1))
+        report = {'series_name':series_name, 'filename':None, 'tables':len(frames), 'rows':0,
+                  'columns':0, 'errors':';'.join(errors)}
+        if (len(frames) > 0):
+            df = pd.concat(frames, ignore_index=True)
+            for column in df.columns[3:]:
+                df[column] = _to_numeric(df[column])
+            # note: the position keeps names unique when series names differ only in case or symbols
+            slug = re.sub(r'\W+', '_', str(series_name)).strip('_').lower() or 'series'
+            report['filename'] = '{:03d}_{}.{}'.format(position, slug, file_format)
+            report['rows'] = len(df)
+            report['columns'] = len(df.columns)
+            filepath = output_directory + '/' + report['filename']
+            if (file_format == 'parquet'):
+                df.to_parquet(filepath, index=False)
+            else:
+                df.to_csv(filepath, index=False)
+        rows.append(report)
+    return pd.DataFrame(rows, columns=columns)
+
+def preflight_datafiles(datafile_metadata, data_directory, checksum_cache=None, max_workers=8):
+    """
+    Check the datafiles of one or more datasets before uploading them, so that
+    an upload that would fail fails before any bytes are sent. The files are
+    checked in parallel: each must exist, its mimetype must be known, and its
+    filename must be unique within its dataset (all files of a dataset share
+    one directory label). If a checksum cache is supplied, the MD5 checksum of
+    each file is computed (or reused, if its size and modification time are
+    unchanged) and files whose checksum changed since it was cached are reported.
+
+    Parameters
+    ----------
+    datafile_metadata : dict
+        Output of 'create_datafile_metadata', keyed on series name
+    data_directory : str
+        Directory where datafiles are kept
+    checksum_cache : str (optional)
+        Full path to JSON cache of file sizes, modification times and checksums
+    max_workers : int (default: 8)
+        Maximum number of concurrent file checks
+
+    Return
+    ------
+    tuple
+        (DataFrame, one row per file: series_name, filename, filepath, size, md5,
+         changed, errors (separated by ;), and ok;
+         DataFrame, the upload plan, one row per series: files, bytes, requests
+         (one upload url request and one upload per file, and one finalize
+         request), and errors)
+    """
+    import concurrent.futures
+    import os
+
+    # files of all series
+    frames = []
+    for series_name, metadata_df in datafile_metadata.items():
+        if ((metadata_df is None) or
+            (metadata_df.empty == True)):
+            continue
+        frames.append(pd.DataFrame({'series_name':series_name,
+                                    'filename':metadata_df['filename_osn'].values,
+                                    'mimetype':metadata_df['mimetype'].values}))
+    if (len(frames) == 0):
+        return pd.DataFrame(), pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    df['filepath'] = data_directory + '/' + df['filename']
+
+    # load the cache: file sizes, modification times and hashes, keyed on path
+    cached = {'files':{}}
+    if (checksum_cache and os.path.exists(checksum_cache)):
+        with open(checksum_cache) as fp:
+            cached = json.loads(fp.read())
+
+    # stat (and hash) each file in parallel
+    def check(filepath):
+        try:
+            status = os.stat(filepath)
+        except OSError:
+            return None, None, False
+        stat = [status.st_size, status.st_mtime_ns]
+        if (not checksum_cache):
+            return status.st_size, None, False
+        entry = cached['files'].get(filepath)
+        if ((entry is not None) and
+            (entry[:2] == stat)):
+            return status.st_size, entry[2], False
+        md5 = _md5_file(filepath)
+        changed = ((entry is not None) and (md5 != entry[2]))
+        cached['files'][filepath] = stat + [md5]
+        return status.st_size, md5, changed
+    filepaths = df['filepath'].unique().tolist()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        checks = dict(zip(filepaths, executor.map(check, filepaths)))
+    df['size'] = pd.array([checks[filepath][0] for filepath in df['filepath']], dtype='Int64')
+    df['md5'] = [checks[filepath][1] for filepath in df['filepath']]
+    df['changed'] = [checks[filepath][2] for filepath in df['filepath']]
+
+    # save the cache
+    if (checksum_cache):
+        with open(checksum_cache, 'w') as fp:
+            fp.write(json.dumps(cached))
+
+    # errors
+    errors = pd.Series('', index=df.index)
+    for error, failed in [('missing', df['size'].isna()),
+                          ('unknown_mimetype', df['mimetype'].isna() | (df['mimetype'] == 'UNKNOWN')),
+                          ('duplicate_filename', df.duplicated(['series_name', 'filename'], keep=False))]:
+        errors = errors.where(~failed, errors + ';' + error)
+    df['errors'] = errors.str.lstrip(';')
+    df['ok'] = (df['errors'] == '')
+
+    # upload plan
+    plan_df = df.groupby('series_name', sort=False).agg(files=('filename', 'size'),
+                                                        bytes=('size', 'sum'),
+                                                        errors=('ok', lambda ok: int((~ok).sum())))
+    plan_df['requests'] = 2 * plan_df['files'] + 1
+    plan_df = plan_df[['files', 'bytes', 'requests', 'errors']].reset_index()
+
+    return df[['series_name','filename','filepath','size','md5','changed','errors','ok']], plan_df
+
+def direct_upload_datafiles(api, dataverse_url, dataset_pid, data_directory, metadata_df, metrics=None):
     """
     Upload Open Metadata datafiles to dataverse repository using direct upload method
 
@@ -323,6 +1129,9 @@ def direct_upload_datafiles(api, dataverse_url, dataset_pid, data_directory, met
         Directory where datafiles are kept
     metadata_df : DataFrame
         DataFrame containing metadata about datafiles to upload
+    metrics : list (optional)
+        List to which per-file and finalize upload metrics are appended
+        (e.g., for 'summarize_upload_metrics' and 'write_upload_metrics')
 
     Return
     ------
@@ -344,10 +1153,31 @@ def direct_upload_datafiles(api, dataverse_url, dataset_pid, data_directory, met
     json_data = []
     categories = None
 
+    # upload metrics
+    if (metrics is None):
+        metrics = []
+
+    # total bytes to upload, for progress reporting
+    import os
+    import time
+    total_files = len(metadata_df)
+    total_bytes = 0
+    for filename in metadata_df['filename_osn']:
+        try:
+            total_bytes = total_bytes + os.stat(data_directory + '/' + filename).st_size
+        except OSError:
+            pass
+    # progress counts only successful uploads; failures are reported separately
+    uploaded_files = 0
+    uploaded_bytes = 0
+    failed_files = 0
+    failed_bytes = 0
+    start = time.perf_counter()
+
     # upload each datafile in the metadata dataframe
     import ddu # local module
     key = api.api_token
-    for row in metadata_df.iterrows():
+    for count, row in enumerate(metadata_df.iterrows(), start=1):
         filename = row[1].get('filename_osn')
         description = row[1].get('description')
         mime_type = row[1].get('mimetype')
@@ -356,7 +1186,9 @@ def direct_upload_datafiles(api, dataverse_url, dataset_pid, data_directory, met
 
          # upload the datafile
         data = {}
-        data = ddu.direct_upload(dataverse_url, dataset_pid, key, filename, data_directory, mime_type, retries=10)
+        record = {'type':'file', 'dataset_pid':dataset_pid}
+        data = ddu.direct_upload(dataverse_url, dataset_pid, key, filename, data_directory, mime_type, retries=10, metrics=record)
+        metrics.append(record)
         if (data == None):
             msg ='Warning: Failed to upload: {}'.format(filename)
             errors.append(msg)
@@ -365,8 +1197,23 @@ def direct_upload_datafiles(api, dataverse_url, dataset_pid, data_directory, met
             data['categories'] = categories
             json_data.append(data)
 
+        # report progress
+        if (data == None):
+            failed_files = failed_files + 1
+            failed_bytes = failed_bytes + record.get('bytes', 0)
+        else:
+            uploaded_files = uploaded_files + 1
+            uploaded_bytes = uploaded_bytes + record.get('bytes', 0)
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        rate = uploaded_bytes / elapsed
+        eta = (total_bytes - uploaded_bytes - failed_bytes) / rate if (rate > 0) else 0
+        print('Progress: {}/{} files ({} failed), {:.2f} files/s, {:.2f} MB/s, ETA {:.0f}s'.format(
+            count, total_files, failed_files, uploaded_files / elapsed, rate / 1e6, max(eta, 0)))
+
     # finalize the direct upload
-    status = ddu.finalize_direct_upload(dataverse_url, dataset_pid, json_data, key)
+    record = {'type':'finalize', 'dataset_pid':dataset_pid}
+    status = ddu.finalize_direct_upload(dataverse_url, dataset_pid, json_data, key, metrics=record)
+    metrics.append(record)
 
     # return errors, if any
     if (len(errors) > 0):
@@ -374,6 +1221,286 @@ def direct_upload_datafiles(api, dataverse_url, dataset_pid, data_directory, met
     else:
         return {'upload':True,'errors':[],'finalize':status}
     
+def summarize_upload_metrics(metrics):
+    """
+    Summarize the upload metrics recorded by 'direct_upload_datafiles'.
+    Bytes and throughput count successful uploads only; failed uploads are
+    counted in files_failed and bytes_failed.
+
+    Parameter
+    ---------
+    metrics : list
+        List of upload metrics
+
+    Return
+    ------
+    dict
+    """
+    files = [m for m in metrics if (m.get('type') == 'file')]
+    finalizes = [m for m in metrics if (m.get('type') == 'finalize')]
+    starts = [m.get('start') for m in metrics if m.get('start')]
+    ends = [m.get('end') for m in metrics if m.get('end')]
+    elapsed = (max(ends) - min(starts)) if (starts and ends) else 0.0
+
+    # http status code counts, keyed on phase and status code
+    status_codes = {}
+    for phase, codes in [('ticket', [c for m in files for c in m.get('ticket_status', [])]),
+                         ('put', [m.get('put_status') for m in files if m.get('put_status')]),
+                         ('finalize', [m.get('finalize_status') for m in finalizes if m.get('finalize_status')])]:
+        for code in codes:
+            status_codes[(phase, code)] = status_codes.get((phase, code), 0) + 1
+
+    succeeded = [m for m in files if m.get('status')]
+    nbytes = sum([m.get('bytes', 0) for m in succeeded])
+    return {
+        'files':len(files),
+        'files_failed':len(files) - len(succeeded),
+        'bytes':nbytes,
+        'bytes_failed':sum([m.get('bytes', 0) for m in files if (not m.get('status'))]),
+        'retries':sum([m.get('retries', 0) for m in files]),
+        'seconds':elapsed,
+        'files_per_second':(len(succeeded) / elapsed) if (elapsed > 0) else 0.0,
+        'mb_per_second':(nbytes / 1e6 / elapsed) if (elapsed > 0) else 0.0,
+        'phase_seconds':{
+            'ticket':sum([m.get('ticket_seconds', 0.0) for m in files]),
+            'put':sum([m.get('put_seconds', 0.0) for m in files]),
+            'hash':sum([m.get('hash_seconds', 0.0) for m in files]),
+            'finalize':sum([m.get('finalize_seconds', 0.0) for m in finalizes])
+        },
+        'status_codes':[{'phase':phase, 'code':code, 'count':count}
+                        for (phase, code), count in sorted(status_codes.items())]
+    }
+
+def write_upload_metrics(metrics, json_file=None, prometheus_file=None):
+    """
+    Write the upload metrics recorded by 'direct_upload_datafiles' to a JSON
+    file and/or a Prometheus text-format file
+
+    Parameters
+    ----------
+    metrics : list
+        List of upload metrics
+    json_file : str (optional)
+        Full path to JSON output file (records and summary)
+    prometheus_file : str (optional)
+        Full path to Prometheus text-format output file (summary)
+
+    Return
+    ------
+    dict
+        Summary of the upload metrics
+    """
+    summary = summarize_upload_metrics(metrics)
+
+    # write records and summary as json
+    if (json_file):
+        with open(json_file, 'w') as fp:
+            fp.write(json.dumps({'summary':summary, 'records':metrics}, indent=2))
+
+    # write summary as prometheus text format
+    if (prometheus_file):
+        lines = []
+        def metric(name, kind, help, samples):
+            lines.append('# HELP histd_upload_{} {}'.format(name, help))
+            lines.append('# TYPE histd_upload_{} {}'.format(name, kind))
+            for labels, value in samples:
+                lines.append('histd_upload_{}{} {}'.format(name, labels, value))
+        metric('files_total', 'counter', 'Number of files uploaded, by status',
+               [('{status="ok"}', summary['files'] - summary['files_failed']),
+                ('{status="failed"}', summary['files_failed'])])
+        metric('bytes_total', 'counter', 'Number of bytes uploaded, by status',
+               [('{status="ok"}', summary['bytes']),
+                ('{status="failed"}', summary['bytes_failed'])])
+        metric('retries_total', 'counter', 'Number of upload ticket retries', [('', summary['retries'])])
+        metric('seconds', 'gauge', 'Wall time of the upload run', [('', summary['seconds'])])
+        metric('phase_seconds_total', 'counter', 'Time spent in each upload phase',
+               [('{{phase="{}"}}'.format(phase), seconds) for phase, seconds in summary['phase_seconds'].items()])
+        metric('http_responses_total', 'counter', 'Number of http responses, by phase and status code',
+               [('{{phase="{}",code="{}"}}'.format(s['phase'], s['code']), s['count']) for s in summary['status_codes']])
+        with open(prometheus_file, 'w') as fp:
+            fp.write('\n'.join(lines) + '\n')
+
+    return summary
+
+def _md5_file(filepath):
+    """
+    Compute the MD5 checksum of a file
+
+    Parameter
+    ---------
+    filepath : str
+
+    Return
+    ------
+    str
+        Hex digest, or None if the file cannot be read
+    """
+    import hashlib
+    file_hash = hashlib.md5()
+    try:
+        with open(filepath, 'rb') as fp:
+            while chunk := fp.read(1024 * 1024):
+                file_hash.update(chunk)
+    except OSError:
+        return None
+    return file_hash.hexdigest()
+
+def _list_dataset_files(session, base_url, dataset_pid):
+    """
+    List the files of the latest version of a dataset, with their
+    server-side sizes and MD5 checksums. Tabular files ingested by dataverse
+    (e.g., csv files stored as .tab) are listed under their original name
+    and size, and their checksum is that of the original file.
+
+    Parameters
+    ----------
+    session : requests.Session
+        With the X-Dataverse-key header
+    base_url : str
+        Dataverse installation url (e.g., https://demo.dataverse.org)
+    dataset_pid : str
+        Persistent identifier for the dataset (its DOI, takes form: doi:xxxxx)
+
+    Raise
+    -----
+    RuntimeError
+        Unexpected response from dataverse API
+
+    Return
+    ------
+    list
+        List of dict: {dataset_pid, filename, file_id, remote_size, remote_md5}
+    """
+    request_url = '{}/api/datasets/:persistentId/versions/:latest/files'.format(base_url)
+    response = session.get(request_url, params={'persistentId':dataset_pid})
+    if (response.status_code != 200):
+        msg = 'Response has status code {} for dataset: {}'.format(response.status_code, dataset_pid)
+        raise RuntimeError(msg)
+    files = []
+    for item in response.json().get('data'):
+        datafile = item.get('dataFile')
+        checksum = datafile.get('checksum') or {}
+        files.append({
+            'dataset_pid':dataset_pid,
+            'filename':datafile.get('originalFileName') or item.get('label'),
+            'file_id':datafile.get('id'),
+            'remote_size':datafile.get('originalFileSize') or datafile.get('filesize'),
+            'remote_md5':checksum.get('value') if (checksum.get('type') == 'MD5') else datafile.get('md5')
+        })
+    return files
+
+def verify_uploaded_datafiles(api, dataset_pids, datafile_metadata, data_directory, metrics=None, max_workers=8):
+    """
+    Verify uploaded datafiles against the file listings of their datasets,
+    without downloading them. Each dataset's listing (with server-side sizes
+    and MD5 checksums) is requested once, concurrently across datasets, and
+    compared to the local files of the datafile metadata.
+
+    Local checksums are taken from the upload metrics recorded by
+    'direct_upload_datafiles', if supplied, otherwise computed from the
+    local files.
+
+    Parameters
+    ----------
+    api : pyDataverse api
+    dataset_pids : dict
+        Dataset pids, keyed on series name
+    datafile_metadata : dict
+        Output of 'create_datafile_metadata', keyed on series name
+    data_directory : str
+        Directory where datafiles are kept
+    metrics : list (optional)
+        Upload metrics recorded by 'direct_upload_datafiles'
+    max_workers : int (default: 8)
+        Maximum number of concurrent requests (and local checksums)
+
+    Raise
+    -----
+    RuntimeError
+        Unexpected response from dataverse API
+
+    Return
+    ------
+    DataFrame
+        One row per file: series_name, dataset_pid, filename, file_id,
+        local_size, remote_size, local_md5, remote_md5, and status
+        (ok, missing, extra, local_missing, size_mismatch, checksum_mismatch).
+        Mismatches are the rows whose status is not ok.
+    """
+    columns = ['series_name','dataset_pid','filename','file_id','local_size','remote_size',
+               'local_md5','remote_md5','status']
+    # validate parameters
+    if ((not api) or
+        (not dataset_pids)):
+        return pd.DataFrame(columns=columns)
+
+    import concurrent.futures
+    import os
+    import requests
+    import threading
+
+    # local files, keyed on dataset pid and filename
+    local = []
+    for series_name, dataset_pid in dataset_pids.items():
+        metadata_df = datafile_metadata.get(series_name)
+        if ((metadata_df is None) or
+            (metadata_df.empty == True)):
+            continue
+        local.append(pd.DataFrame({'series_name':series_name,
+                                   'dataset_pid':dataset_pid,
+                                   'filename':metadata_df['filename_osn'].values}))
+    local_df = pd.concat(local, ignore_index=True) if (len(local) > 0) else pd.DataFrame(columns=['series_name','dataset_pid','filename'])
+
+    # local sizes
+    def local_size(filename):
+        try:
+            return os.stat(data_directory + '/' + filename).st_size
+        except OSError:
+            return None
+    local_df['local_size'] = pd.array([local_size(filename) for filename in local_df['filename']], dtype='Int64')
+
+    # local checksums: from successful uploads, otherwise from the local files
+    checksums = {}
+    for record in (metrics or []):
+        if ((record.get('type') == 'file') and
+            (record.get('status')) and
+            (record.get('md5'))):
+            checksums[(record.get('dataset_pid'), record.get('filename'))] = record.get('md5')
+    keys = list(zip(local_df['dataset_pid'], local_df['filename']))
+    todo = [key for key in keys if (key not in checksums)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for key, md5 in zip(todo, executor.map(_md5_file, [data_directory + '/' + key[1] for key in todo])):
+            checksums[key] = md5
+    local_df['local_md5'] = [checksums.get(key) for key in keys]
+
+    # remote files, one listing per dataset
+    sessions = threading.local()
+    def list_files(dataset_pid):
+        if (not hasattr(sessions, 'session')):
+            sessions.session = requests.Session()
+            sessions.session.headers.update({'X-Dataverse-key':api.api_token})
+        return _list_dataset_files(sessions.session, api.base_url, dataset_pid)
+    remote = []
+    pids = list(dict.fromkeys(dataset_pids.values()))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for files in executor.map(list_files, pids):
+            remote = remote + files
+    remote_df = pd.DataFrame.from_records(remote, columns=['dataset_pid','filename','file_id','remote_size','remote_md5'])
+    remote_df['remote_size'] = remote_df['remote_size'].astype('Int64')
+    remote_df['file_id'] = remote_df['file_id'].astype('Int64')
+
+    # compare
+    df = local_df.merge(remote_df, on=['dataset_pid','filename'], how='outer', indicator=True)
+    series_names = {dataset_pid:series_name for series_name, dataset_pid in dataset_pids.items()}
+    df['series_name'] = df['series_name'].fillna(df['dataset_pid'].map(series_names))
+    df['status'] = np.select([df['_merge'] == 'right_only',
+                              df['_merge'] == 'left_only',
+                              df['local_size'].isna(),
+                              (df['local_size'] != df['remote_size']).fillna(True),
+                              df['local_md5'] != df['remote_md5']],
+                             ['extra','missing','local_missing','size_mismatch','checksum_mismatch'], default='ok')
+    return df[columns]
+
 def delete_datasets(api, dataverse_url):
     """
     Delete all datasets in the dataverse collection. 
@@ -20,8 +20,16 @@ import re
 import requests
 import json
 import hashlib
+import time
+
+def direct_upload(dataverse_url, dataset_pid, key, filename, path, mime_type, retries=10, metrics=None):
+    # metrics (optional): dict populated with per-phase timings, bytes, retries and http status codes
+    if metrics is None:
+        metrics = {}
+    metrics.update({"filename": filename, "bytes": 0, "retries": 0,
+                    "ticket_seconds": 0.0, "put_seconds": 0.0, "hash_seconds": 0.0,
+                    "ticket_status": [], "put_status": None, "start": time.time()})
 
-def direct_upload(dataverse_url, dataset_pid, key, filename, path, mime_type, retries=10):
     data_id = None
     if path is not None:
         file_path = path + "/" + filename
@@ -29,6 +37,7 @@ def direct_upload(dataverse_url, dataset_pid, key, filename, path, mime_type, re
         file_path = filename
     
     file_size = os.stat(file_path).st_size 
+    metrics["bytes"] = file_size
     # start with a call to Dataverse to obtain a "ticket" for the upload to S3:
     while retries > 0:
         url_string = dataverse_url + "/api/datasets/:persistentId/uploadurls"
@@ -36,7 +45,10 @@ def direct_upload(dataverse_url, dataset_pid, key, filename, path, mime_type, re
 
         #print("url string: "+url_string)
         
+        start = time.perf_counter()
         response = requests.get(url_string)
+        metrics["ticket_seconds"] += time.perf_counter() - start
+        metrics["ticket_status"].append(response.status_code)
 
         if response.status_code == 200:
             upload_url = None
@@ -57,18 +69,24 @@ def direct_upload(dataverse_url, dataset_pid, key, filename, path, mime_type, re
                     print("upload url: "+upload_url)
                     #print("storage identifier: "+storage_identifier)
                     #files = {'upload_file': open(file_path,'rb')}
+                    start = time.perf_counter()
                     upload_response = requests.put(upload_url, data=open(file_path, 'rb'), headers={'x-amz-tagging': 'dv-state=temp'},)
+                    metrics["put_seconds"] = time.perf_counter() - start
+                    metrics["put_status"] = upload_response.status_code
 
                     if upload_response.status_code == 200:
                         # Calculate MD5:
                         # (this is inefficient - we are going to read the file the second time
                         # but it should work for reasonable-sized files)
+                        start = time.perf_counter()
                         with open(file_path, "rb") as f:
                             file_hash = hashlib.md5()
                             while chunk := f.read(8192):
                                 file_hash.update(chunk)
 
                         md5_hash = file_hash.hexdigest()
+                        metrics["hash_seconds"] = time.perf_counter() - start
+                        metrics["md5"] = md5_hash
                         
                         json_data = {
                             "storageIdentifier": storage_identifier,
@@ -82,6 +100,8 @@ def direct_upload(dataverse_url, dataset_pid, key, filename, path, mime_type, re
                             json_data["directoryLabel"] = re.sub('^/', '', path)
 
                         #json_string = json.dumps(json_data)
+                        metrics["end"] = time.time()
+                        metrics["status"] = True
                         return json_data
                     else:
                         print("Direct upload to S3 bucket failed. (giving up)")
@@ -95,15 +115,24 @@ def direct_upload(dataverse_url, dataset_pid, key, filename, path, mime_type, re
             else:
                 print("Invalid response from Dataverse (no data), retrying")
                 retries = retries - 1
+                metrics["retries"] += 1
             
         else:
             print("Received return code: " + str(response.status_code) + ", retrying")
             retries = retries - 1
+            metrics["retries"] += 1
 
     # If we have reached here, that means we have failed.
+    metrics["end"] = time.time()
+    metrics["status"] = False
     return None
 
-def finalize_direct_upload(dataverse_url, dataset_pid, json_data, key):
+def finalize_direct_upload(dataverse_url, dataset_pid, json_data, key, metrics=None):
+    # metrics (optional): dict populated with the call's timing and http status code
+    if metrics is None:
+        metrics = {}
+    metrics.update({"files": len(json_data), "start": time.time()})
+
     url_string = dataverse_url + "/api/datasets/:persistentId/addFiles"
     url_string = url_string + "?persistentId=" + dataset_pid + "&key=" + key
 
@@ -125,7 +154,11 @@ def finalize_direct_upload(dataverse_url, dataset_pid, json_data, key):
     multipart_form_data = {
         'jsonData': (None, json_string)
     }
+    start = time.perf_counter()
     response = requests.post(url_string, files=multipart_form_data)
+    metrics["finalize_seconds"] = time.perf_counter() - start
+    metrics["finalize_status"] = response.status_code
+    metrics["end"] = time.time()
 
     # neat (and weird), huh? 
 
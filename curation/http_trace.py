@@ -0,0 +1,367 @@
+"""
+Harvard Library Historical Datasets HTTP Trace Module
+
+Opt-in record and replay of the HTTP requests made by local modules (e.g., curate, ddu)
+through the requests library. Recording captures each request's method, url, sizes,
+status and timing (and the response, for replay) to a JSON lines trace file, with API
+keys, tokens and signatures redacted (also from urls in response bodies). Replay serves
+the recorded responses, in order per request, with the original latencies, so that
+upload scheduling and concurrency changes can be benchmarked offline.
+
+Use as a context manager:
+
+    with http_trace.record('./http_trace.jsonl'):
+        curate.direct_upload_datafiles(...)
+
+    with http_trace.replay('./http_trace.jsonl'):
+        curate.direct_upload_datafiles(...)
+
+or enable with an environment variable, set before running a notebook or script:
+
+    HISTD_HTTP_RECORD=./http_trace.jsonl
+    HISTD_HTTP_REPLAY=./http_trace.jsonl
+
+    http_trace.enable_from_environment()
+"""
+import atexit
+import base64
+import contextlib
+import datetime
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+
+import pandas as pd
+
+# environment variables
+RECORD_ENV_VAR = 'HISTD_HTTP_RECORD'
+REPLAY_ENV_VAR = 'HISTD_HTTP_REPLAY'
+
+# query parameters and headers whose values are redacted (lower case)
+REDACTED_PARAMS = ['key', 'token', 'x-amz-signature', 'x-amz-credential', 'x-amz-security-token']
+REDACTED_HEADERS = ['x-dataverse-key', 'authorization']
+REDACTED = 'REDACTED'
+
+# response headers recorded for replay
+RESPONSE_HEADERS = ['Content-Type', 'ETag', 'Last-Modified', 'Location']
+
+def _redact_url(url):
+    """
+    Redact the values of secret query parameters of a url
+
+    Parameter
+    ---------
+    url : str
+
+    Return
+    ------
+    str
+    """
+    parts = urllib.parse.urlsplit(url)
+    if (not parts.query):
+        return url
+    query = [(name, REDACTED if (name.lower() in REDACTED_PARAMS) else value)
+             for name, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)]
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query, safe=':/')))
+
+def _redact_text(text):
+    """
+    Redact the values of secret query parameters of the urls in a text
+    (e.g., presigned upload urls in a response body)
+
+    Parameter
+    ---------
+    text : str
+
+    Return
+    ------
+    str
+    """
+    pattern = r'(?i)([?&](?:{})=)[^&"\'\s]*'.format('|'.join([re.escape(name) for name in REDACTED_PARAMS]))
+    return re.sub(pattern, r'\g<1>' + REDACTED, text)
+
+def _request_url(url, params):
+    """
+    Get the full url of a request, including its params
+
+    Parameters
+    ----------
+    url : str
+    params : dict or None
+
+    Return
+    ------
+    str
+    """
+    if (not params):
+        return url
+    separator = '&' if ('?' in url) else '?'
+    return url + separator + urllib.parse.urlencode(params, safe=':/')
+
+def _request_bytes(kwargs):
+    """
+    Get the size of a request's body, without reading it
+
+    Parameter
+    ---------
+    kwargs : dict
+        Keyword arguments of requests.Session.request
+
+    Return
+    ------
+    int
+    """
+    size = 0
+    for body in [kwargs.get('data'), kwargs.get('json')]:
+        if (body is None):
+            continue
+        if (isinstance(body, (bytes, str))):
+            size = size + len(body)
+        elif (hasattr(body, 'fileno')):
+            size = size + os.fstat(body.fileno()).st_size
+        elif (isinstance(body, dict)):
+            size = size + len(json.dumps(body))
+    for value in (kwargs.get('files') or {}).values():
+        content = value[1] if (isinstance(value, tuple)) else value
+        if (isinstance(content, (bytes, str))):
+            size = size + len(content)
+        elif (hasattr(content, 'fileno')):
+            size = size + os.fstat(content.fileno()).st_size
+    return size
+
+def _endpoint(url):
+    """
+    Get the endpoint of a url: its path, with numeric ids replaced
+
+    Parameter
+    ---------
+    url : str
+
+    Return
+    ------
+    str
+    """
+    path = urllib.parse.urlsplit(url).path
+    return re.sub(r'/\d+(?=/|$)', '/{id}', path)
+
+@contextlib.contextmanager
+def _patch_requests(request):
+    """
+    Replace requests.Session.request (used by requests.get, post, etc.) within a context
+
+    Parameter
+    ---------
+    request : function
+        Replacement, called with (original request function, session, method, url, **kwargs)
+    """
+    import requests
+    original = requests.Session.request
+    def wrapper(session, method, url, **kwargs):
+        return request(original, session, method, url, **kwargs)
+    requests.Session.request = wrapper
+    try:
+        yield
+    finally:
+        requests.Session.request = original
+
+@contextlib.contextmanager
+def record(trace_file, bodies=True):
+    """
+    Record the HTTP requests made through the requests library within a context
+    to a JSON lines trace file (one request per line)
+
+    Parameters
+    ----------
+    trace_file : str
+        Full path to trace file (overwritten)
+    bodies : bool (default: True)
+        Record response bodies (needed for replay)
+
+    Return
+    ------
+    list
+        Trace records of the run (one dict per request)
+    """
+    records = []
+    lock = threading.Lock()
+    fp = open(trace_file, 'w')
+
+    def request(original, session, method, url, **kwargs):
+        full_url = _request_url(url, kwargs.get('params'))
+        headers = {}
+        headers.update(session.headers)
+        headers.update(kwargs.get('headers') or {})
+        entry = {
+            'start':time.time(),
+            'thread':threading.get_ident(),
+            'method':method.upper(),
+            'url':_redact_url(full_url),
+            'endpoint':_endpoint(full_url),
+            'redacted_headers':sorted([name for name in headers if (name.lower() in REDACTED_HEADERS)]),
+            'request_bytes':_request_bytes(kwargs),
+            'status':None,
+            'response_bytes':None,
+            'seconds':None,
+            'error':''
+        }
+        start = time.perf_counter()
+        try:
+            response = original(session, method, url, **kwargs)
+        except Exception as error:
+            entry['seconds'] = time.perf_counter() - start
+            entry['error'] = '{}: {}'.format(type(error).__name__, error)
+            raise
+        else:
+            entry['seconds'] = time.perf_counter() - start
+            entry['status'] = response.status_code
+            entry['response_bytes'] = len(response.content)
+            entry['headers'] = {name:response.headers.get(name) for name in RESPONSE_HEADERS
+                                if (response.headers.get(name) is not None)}
+            if (bodies):
+                try:
+                    entry['body'] = _redact_text(response.content.decode('utf-8'))
+                except UnicodeDecodeError:
+                    entry['body_base64'] = base64.b64encode(response.content).decode('ascii')
+            return response
+        finally:
+            with lock:
+                records.append(entry)
+                fp.write(json.dumps(entry) + '\n')
+                fp.flush()
+
+    try:
+        with _patch_requests(request):
+            yield records
+    finally:
+        fp.close()
+
+def _load_trace(trace_file):
+    """
+    Read the records of a trace file
+
+    Parameter
+    ---------
+    trace_file : str
+        Full path to trace file
+
+    Return
+    ------
+    list
+        List of dict, one per request
+    """
+    with open(trace_file) as fp:
+        return [json.loads(line) for line in fp if line.strip()]
+
+@contextlib.contextmanager
+def replay(trace_file, latency=True):
+    """
+    Serve the responses of a trace file to the HTTP requests made through the
+    requests library within a context, without network access. Requests are
+    matched on method and (redacted) url, in recorded order per request.
+
+    Parameters
+    ----------
+    trace_file : str
+        Full path to trace file (recorded with response bodies)
+    latency : bool (default: True)
+        Wait for the recorded time of each request
+
+    Raise
+    -----
+    RuntimeError
+        Request not found in the trace file (raised by the requests)
+
+    Return
+    ------
+    dict
+        Remaining recorded responses, keyed on (method, url)
+    """
+    import requests
+    import requests.structures
+
+    # recorded responses, in order per request
+    pending = {}
+    for entry in _load_trace(trace_file):
+        pending.setdefault((entry.get('method'), entry.get('url')), []).append(entry)
+    lock = threading.Lock()
+
+    def request(original, session, method, url, **kwargs):
+        full_url = _request_url(url, kwargs.get('params'))
+        key = (method.upper(), _redact_url(full_url))
+        with lock:
+            entries = pending.get(key)
+            entry = entries.pop(0) if (entries) else None
+        if (entry is None):
+            msg = 'No recorded response for request: {} {}'.format(*key)
+            raise RuntimeError(msg)
+        if (latency):
+            time.sleep(entry.get('seconds') or 0)
+        if (entry.get('status') is None):
+            raise requests.ConnectionError('Recorded error: {}'.format(entry.get('error')))
+        response = requests.Response()
+        response.status_code = entry.get('status')
+        if ('body_base64' in entry):
+            response._content = base64.b64decode(entry.get('body_base64'))
+        else:
+            response._content = entry.get('body', '').encode('utf-8')
+        response.headers = requests.structures.CaseInsensitiveDict(entry.get('headers') or {})
+        response.url = full_url
+        response.encoding = 'utf-8'
+        response.elapsed = datetime.timedelta(seconds=entry.get('seconds') or 0)
+        return response
+
+    with _patch_requests(request):
+        yield pending
+
+def summarize_trace(trace_file):
+    """
+    Summarize the requests of a trace file by method and endpoint
+
+    Parameter
+    ---------
+    trace_file : str
+        Full path to trace file
+
+    Return
+    ------
+    DataFrame
+        One row per method and endpoint, slowest total time first
+    """
+    records = _load_trace(trace_file)
+    if (len(records) == 0):
+        return pd.DataFrame()
+    df = pd.DataFrame.from_records(records)
+    df['failed'] = df['status'].isna() | (df['status'] >= 400)
+    report = df.groupby(['method', 'endpoint']).agg(requests=('url', 'size'),
+                                                    failed=('failed', 'sum'),
+                                                    seconds=('seconds', 'sum'),
+                                                    max_seconds=('seconds', 'max'),
+                                                    request_bytes=('request_bytes', 'sum'),
+                                                    response_bytes=('response_bytes', 'sum'))
+    return report.sort_values('seconds', ascending=False).reset_index()
+
+def enable_from_environment():
+    """
+    Record or replay HTTP requests until the process exits, if the
+    HISTD_HTTP_RECORD or HISTD_HTTP_REPLAY environment variable is set
+    to the full path of a trace file
+
+    Return
+    ------
+    str
+        record, replay, or None
+    """
+    for mode, variable, context in [('record', RECORD_ENV_VAR, record),
+                                    ('replay', REPLAY_ENV_VAR, replay)]:
+        trace_file = os.environ.get(variable)
+        if (trace_file):
+            manager = context(trace_file)
+            manager.__enter__()
+            atexit.register(manager.__exit__, None, None, None)
+            return mode
+    return None
+
+# end file
@@ -0,0 +1,84 @@
+"""
+Harvard Library Historical Datasets Import-Time Benchmark
+
+Measures the time to import the util and curate modules in fresh Python
+processes, and fails if importing them loads a heavy dependency that only
+some of their functions need (e.g., osfclient, pyDataverse).
+
+Usage: python benchmark_import.py [--repeat N] [--max-seconds S]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# local modules and their directories, relative to this file
+g_modules = {
+    'util':'../util',
+    'curate':'../curation'
+}
+
+# dependencies that must not be loaded at import time
+g_lazy_dependencies = ['osfclient', 'PIL', 'pyDataverse', 'requests', 'xmltodict']
+
+# child process: import a module, report the import time and the lazy dependencies loaded
+g_child = """
+import json, sys, time
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds':seconds, 'loaded':[m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+def measure_import(module, path, repeat=5):
+    """
+    Import a module in fresh Python processes
+
+    Parameters
+    ----------
+    module : str
+        Module name
+    path : str
+        Directory of the module
+    repeat : int (default: 5)
+        Number of processes
+
+    Return
+    ------
+    dict
+        {module: str, seconds: float (median), loaded: list}
+    """
+    code = g_child.format(path=path, module=module, lazy=g_lazy_dependencies)
+    seconds = []
+    loaded = set()
+    for i in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().split('\n')[-1])
+        seconds.append(result.get('seconds'))
+        loaded.update(result.get('loaded'))
+    return {'module':module, 'seconds':statistics.median(seconds), 'loaded':sorted(loaded)}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark import time of local modules')
+    parser.add_argument('--repeat', type=int, default=5, help='number of processes per module (default: 5)')
+    parser.add_argument('--max-seconds', type=float, default=None, help='fail if an import takes longer')
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    failed = False
+    for module, path in g_modules.items():
+        result = measure_import(module, os.path.join(here, path), repeat=args.repeat)
+        print('{:>10} {:>8.3f}s loaded: {}'.format(module, result['seconds'], result['loaded']))
+        if (len(result['loaded']) > 0):
+            print('Error: {} loads dependencies at import time: {}'.format(module, result['loaded']))
+            failed = True
+        if ((args.max_seconds) and
+            (result['seconds'] > args.max_seconds)):
+            print('Error: {} import takes longer than {}s'.format(module, args.max_seconds))
+            failed = True
+    sys.exit(1 if failed else 0)
+
+# end file
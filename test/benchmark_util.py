@@ -0,0 +1,167 @@
+"""
+Harvard Library Historical Datasets Util Benchmarks
+
+Times and memory-profiles the util inventory and reconciliation functions
+against synthetic datasets (see synthetic.py) of increasing size, and saves
+the results to JSON. If a previous results file is supplied, reports
+functions that became slower or used more memory.
+
+Usage: python benchmark_util.py [--max-files N] [--output results.json] [--compare previous.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# path to local util code module
+g_util_module_path = '../util'
+if g_util_module_path not in sys.path:
+    sys.path.append(g_util_module_path)
+
+import pandas as pd
+import synthetic # local module
+import util # local module
+
+# approximate numbers of vendor files to benchmark
+g_sizes = [1000, 10000, 100000, 1000000]
+
+# vendor files per page (image, txt, alto and one csv, on average)
+g_files_per_page = 4
+
+# maximum number of vendor files for functions that process rows one at a time
+g_max_files = {
+    'generate_transcription_report':100000,
+    'map_drs_vendor_inventory':10000
+}
+
+# ratio above which a change from the previous results is reported
+g_regression_ratio = 1.2
+
+def measure(func, *args, **kwargs):
+    """
+    Time a function call, then repeat it to measure its peak memory
+
+    Parameters
+    ----------
+    func : function
+    args, kwargs :
+        Function arguments
+
+    Return
+    ------
+    tuple
+        (result, seconds, peak memory bytes)
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def benchmark_size(directory, num_files):
+    """
+    Benchmark the util functions on one synthetic dataset
+
+    Parameters
+    ----------
+    directory : str
+        Directory for the synthetic dataset
+    num_files : int
+        Approximate number of vendor files
+
+    Return
+    ------
+    list
+        List of dict, one per function
+    """
+    dataset = synthetic.generate_dataset(directory, max(num_files // g_files_per_page, 1),
+                                         missing=0.01, duplicate=0.0, extra=0.0)
+    results = []
+    def run(name, *args, **kwargs):
+        if (dataset['num_files'] > g_max_files.get(name, dataset['num_files'])):
+            return None
+        result, seconds, peak = measure(getattr(util, name), *args, **kwargs)
+        results.append({'function':name, 'files':dataset['num_files'], 'seconds':seconds, 'peak_memory_bytes':peak})
+        print('{:>45} {:>9} files {:>10.3f}s {:>10.1f} MB'.format(name, dataset['num_files'], seconds, peak / 1e6))
+        return result
+
+    # parse inputs
+    iiif_df = run('iiif_to_dataframe', dataset['iiif'])
+    mets_df = run('mets_to_dataframe', dataset['mets'])
+    run('drs_inventory_to_dataframe', dataset['drs'])
+
+    # inventories
+    do_inventory_df = run('create_digital_object_inventory', iiif_df, itype='iiif')
+    vendor_inventory_df = run('create_vendor_inventory', mets_df, drsids=True, path=directory)
+    csv_df = run('extract_transcription_inventory', vendor_inventory_df, ttype='csv')
+    csv_report_df = run('generate_transcription_report', csv_df)
+
+    # reconciliation
+    run('find_missing_reference_ids', do_inventory_df['drs_id'], vendor_inventory_df['drs_id'])
+    if (csv_report_df is not None):
+        run('find_missing_transcription_reference_ids', do_inventory_df, csv_report_df, reftype='drs')
+    run('reconcile_inventories', do_inventory_df, vendor_inventory_df)
+    do_osn_inventory_df = pd.read_csv(dataset['drs'])
+    run('map_drs_vendor_inventory', vendor_inventory_df, do_osn_inventory_df)
+    return results
+
+def compare_results(results, previous):
+    """
+    Compare benchmark results to previous results
+
+    Parameters
+    ----------
+    results : list
+    previous : list
+
+    Return
+    ------
+    list
+        List of dict, one per regression
+    """
+    before = {(r['function'], r['files']):r for r in previous}
+    regressions = []
+    for result in results:
+        old = before.get((result['function'], result['files']))
+        if (not old):
+            continue
+        for key in ['seconds', 'peak_memory_bytes']:
+            if ((old[key] > 0) and
+                (result[key] / old[key] > g_regression_ratio)):
+                regressions.append({'function':result['function'], 'files':result['files'],
+                                    'measure':key, 'before':old[key], 'after':result[key]})
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark util inventory and reconciliation functions')
+    parser.add_argument('--max-files', type=int, default=100000, help='largest dataset size (default: 100000)')
+    parser.add_argument('--output', default='benchmark_util.json', help='results file')
+    parser.add_argument('--compare', default=None, help='previous results file')
+    args = parser.parse_args()
+
+    results = []
+    for num_files in [size for size in g_sizes if size <= args.max_files]:
+        with tempfile.TemporaryDirectory() as directory:
+            results = results + benchmark_size(directory, num_files)
+
+    with open(args.output, 'w') as fp:
+        fp.write(json.dumps({'python':platform.python_version(),
+                             'pandas':pd.__version__,
+                             'created':time.strftime('%Y-%m-%dT%H:%M:%S'),
+                             'results':results}, indent=2))
+
+    if (args.compare):
+        with open(args.compare) as fp:
+            previous = json.loads(fp.read()).get('results')
+        for regression in compare_results(results, previous):
+            print('Regression: {function} ({files} files) {measure}: {before:.4g} -> {after:.4g}'.format(**regression))
+
+# end file
@@ -0,0 +1,148 @@
+"""
+Harvard Library Historical Datasets Synthetic Data Generator
+
+Generates a consistent set of synthetic inputs for the util module functions:
+an IIIF manifest, a vendor METS file, a DRS inventory CSV, and (optionally) a
+vendor file tree, with controlled numbers of missing, duplicate, and extra
+DRS ids.
+
+Each page of the digital object has a DRS id and, in the vendor delivery,
+an image, a txt transcription, an ALTO file, and zero or more csv tables.
+"""
+import json
+import os
+import random
+
+# first synthetic drs id
+g_first_drs_id = 50000000
+
+# owner-supplied name prefix
+g_osn_prefix = '000000001_pt1_'
+
+def _vendor_files(drs_id, num_csv):
+    """
+    List the vendor files for a page
+
+    Parameters
+    ----------
+    drs_id : int
+    num_csv : int
+        Number of csv tables on the page
+
+    Return
+    ------
+    list
+        List of (file type, mimetype, filename)
+    """
+    files = [('image', 'image/jpeg', '{}.jpg'.format(drs_id)),
+             ('txt', 'text/plain', '{}.txt'.format(drs_id)),
+             ('alto', 'text/xml', '{}.xml'.format(drs_id))]
+    for i in range(num_csv):
+        files.append(('csv', 'text/csv', '{}_{}.csv'.format(drs_id, chr(ord('a') + i))))
+    return files
+
+def generate_dataset(directory, num_pages, missing=0.0, duplicate=0.0, extra=0.0,
+                     max_csv=2, file_tree=False, seed=0):
+    """
+    Generate a synthetic digital object and vendor delivery
+
+    Parameters
+    ----------
+    directory : str
+        Output directory (created if needed)
+    num_pages : int
+        Number of pages (DRS ids) in the digital object
+    missing : float (default: 0.0)
+        Fraction of digital object DRS ids with no vendor files
+    duplicate : float (default: 0.0)
+        Fraction of digital object DRS ids listed twice in the IIIF manifest
+    extra : float (default: 0.0)
+        Number of vendor-only DRS ids, as a fraction of num_pages
+    max_csv : int (default: 2)
+        Maximum number of csv tables per page
+    file_tree : bool (default: False)
+        Write (empty) vendor files, one directory per file type
+    seed : int (default: 0)
+        Random seed
+
+    Return
+    ------
+    dict
+        Paths of the generated files, number of vendor files, and the
+        expected missing, duplicate, and extra DRS ids (as str)
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    # digital object and vendor drs ids
+    do_ids = list(range(g_first_drs_id, g_first_drs_id + num_pages))
+    missing_ids = set(rng.sample(do_ids, int(num_pages * missing)))
+    duplicate_ids = set(rng.sample(do_ids, int(num_pages * duplicate)))
+    extra_ids = list(range(g_first_drs_id + num_pages, g_first_drs_id + num_pages + int(num_pages * extra)))
+    vendor_ids = [drs_id for drs_id in do_ids if (drs_id not in missing_ids)] + extra_ids
+
+    # iiif manifest
+    canvases = []
+    for drs_id in do_ids:
+        canvas = {'images':[{'resource':{
+            '@id':'https://ids.lib.harvard.edu/ids/iiif/{}/full/full/0/default.jpg'.format(drs_id),
+            'format':'image/jpeg',
+            'service':{'@id':'https://ids.lib.harvard.edu/ids/iiif/{}'.format(drs_id)}}}]}
+        canvases.append(canvas)
+        if (drs_id in duplicate_ids):
+            canvases.append(canvas)
+    iiif_file = os.path.join(directory, 'iiif_manifest.json')
+    with open(iiif_file, 'w') as fp:
+        fp.write(json.dumps({'sequences':[{'canvases':canvases}]}))
+
+    # vendor files, grouped by file type
+    groups = {'image':[], 'txt':[], 'alto':[], 'csv':[]}
+    for drs_id in vendor_ids:
+        for file_type, mimetype, filename in _vendor_files(drs_id, rng.randint(0, max_csv)):
+            groups[file_type].append((mimetype, filename))
+
+    # mets file
+    mets_file = os.path.join(directory, 'mets.xml')
+    num_files = 0
+    with open(mets_file, 'w') as fp:
+        fp.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        fp.write('<mets xmlns:xlink="http://www.w3.org/1999/xlink">\n<fileSec>\n')
+        for file_type, files in groups.items():
+            fp.write('<fileGrp USE="{}">\n'.format(file_type))
+            for mimetype, filename in files:
+                num_files = num_files + 1
+                fp.write('<file ID="FILE{}" MIMETYPE="{}"><FLocat xlink:href="{}/{}"/></file>\n'.format(
+                    num_files, mimetype, file_type, filename))
+            fp.write('</fileGrp>\n')
+        fp.write('</fileSec>\n</mets>\n')
+
+    # drs inventory
+    drs_file = os.path.join(directory, 'drs_inventory.csv')
+    with open(drs_file, 'w') as fp:
+        fp.write('file_id_num,file_huldrsadmin_ownerSuppliedName_string,'
+                 'file_mets_mimetype_string,file_huldrsadmin_uri_string_sort\n')
+        for page, drs_id in enumerate(do_ids, start=1):
+            fp.write('{},{}{:05d},image/jpeg,urn-3:HUL.DRS.FILE:{}\n'.format(drs_id, g_osn_prefix, page, drs_id))
+
+    # vendor file tree
+    vendor_directory = None
+    if (file_tree):
+        vendor_directory = os.path.join(directory, 'vendor')
+        for file_type, files in groups.items():
+            os.makedirs(os.path.join(vendor_directory, file_type), exist_ok=True)
+            for mimetype, filename in files:
+                open(os.path.join(vendor_directory, file_type, filename), 'w').close()
+
+    return {
+        'iiif':iiif_file,
+        'mets':mets_file,
+        'drs':drs_file,
+        'vendor_directory':vendor_directory,
+        'num_pages':num_pages,
+        'num_files':num_files,
+        'missing':sorted([str(drs_id) for drs_id in missing_ids]),
+        'duplicate':sorted([str(drs_id) for drs_id in duplicate_ids]),
+        'extra':[str(drs_id) for drs_id in extra_ids]
+    }
+
+# end file
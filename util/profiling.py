@@ -0,0 +1,322 @@
+"""
+Harvard Library Historical Datasets Profiling Module
+
+Opt-in profiling of the public functions of local modules (e.g., util, curate, ddu).
+For each call, records wall time, CPU time, rows in and out, and peak memory
+(using tracemalloc). Optionally dumps cProfile statistics for named functions.
+
+Use as a context manager:
+
+    with profiling.profile_functions(util, curate, report='./profile_report.json'):
+        ...
+
+or enable with an environment variable, set before running a notebook or script:
+
+    HISTD_PROFILE=./profile_report.json (or 1, for ./profile_report.json)
+    HISTD_PROFILE_CPROFILE=mets_to_dataframe,create_datafile_metadata (optional)
+
+    profiling.enable_from_environment(util, curate, ddu)
+
+Profiling is single-threaded: tracemalloc and cProfile are process-wide, so memory
+and cProfile statistics are recorded only for calls made in the thread that started
+profiling (the memory of such a call includes the allocations of any threads it
+starts). Calls of profiled functions from other threads (e.g., the thread pools of
+fetch_urls or verify_uploaded_datafiles) record wall and thread CPU time and rows only.
+"""
+import atexit
+import contextlib
+import cProfile
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+# environment variables
+PROFILE_ENV_VAR = 'HISTD_PROFILE'
+CPROFILE_ENV_VAR = 'HISTD_PROFILE_CPROFILE'
+
+# default report file
+DEFAULT_REPORT = './profile_report.json'
+
+# per call records of the current run
+_records = []
+
+# stack of calls being profiled, per thread
+_local = threading.local()
+
+# thread that started profiling (the only thread whose calls are memory profiled)
+# and lock of the records shared by all threads
+_owner = {'thread':None}
+_lock = threading.Lock()
+
+# names of functions to profile with cProfile, and where to write the dumps
+_cprofile = {'names':set(), 'directory':'.', 'count':0, 'active':False}
+
+def _count_rows(value):
+    """
+    Count the rows of a DataFrame, Series, list or dict, if any
+    (or of the first element of a tuple)
+
+    Parameter
+    ---------
+    value : object
+
+    Return
+    ------
+    int or None
+    """
+    if ((isinstance(value, tuple)) and
+        (len(value) > 0)):
+        value = value[0]
+    if (isinstance(value, (pd.DataFrame, pd.Series, list, dict))):
+        return len(value)
+    return None
+
+def _wrap(module_name, func):
+    """
+    Wrap a function to record a profile of each call
+
+    Parameters
+    ----------
+    module_name : str
+    func : function
+
+    Return
+    ------
+    function
+    """
+    name = '{}.{}'.format(module_name, func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = getattr(_local, 'stack', None)
+        if (stack is None):
+            stack = _local.stack = []
+        # memory and cProfile: only in the thread that started profiling
+        owner = (threading.get_ident() == _owner['thread'])
+
+        # rows in: first DataFrame, Series, list or dict argument
+        rows_in = None
+        for arg in list(args) + list(kwargs.values()):
+            rows_in = _count_rows(arg)
+            if (rows_in is not None):
+                break
+
+        # fold the peak memory so far into the calling function, then reset it
+        frame = {'start':0, 'peak':0}
+        if (owner):
+            current, peak = tracemalloc.get_traced_memory()
+            if (stack):
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame = {'start':current, 'peak':current}
+        stack.append(frame)
+
+        # cProfile the outermost call of a named function
+        profiler = None
+        if ((owner) and
+            (func.__name__ in _cprofile['names']) and
+            (not _cprofile['active'])):
+            profiler = cProfile.Profile()
+            _cprofile['active'] = True
+
+        # cpu time: of the process in the profiling thread (including the threads
+        # started by the call), of the calling thread otherwise
+        cpu_time = time.process_time if (owner) else time.thread_time
+        wall = time.perf_counter()
+        cpu = cpu_time()
+        try:
+            if (profiler):
+                result = profiler.runcall(func, *args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = cpu_time() - cpu
+            stack.pop()
+            if (owner):
+                current, peak = tracemalloc.get_traced_memory()
+                frame['peak'] = max(frame['peak'], peak)
+                if (stack):
+                    stack[-1]['peak'] = max(stack[-1]['peak'], frame['peak'])
+            record = {
+                'function':name,
+                'depth':len(stack),
+                'thread':'profiling' if (owner) else 'other',
+                'wall_seconds':wall,
+                'cpu_seconds':cpu,
+                'rows_in':rows_in,
+                'rows_out':None,
+                'peak_memory_bytes':(frame['peak'] - frame['start']) if (owner) else None,
+                'cprofile':None
+            }
+            if (profiler):
+                _cprofile['active'] = False
+                _cprofile['count'] = _cprofile['count'] + 1
+                dump = '{}/{}.{}.prof'.format(_cprofile['directory'], func.__name__, _cprofile['count'])
+                profiler.dump_stats(dump)
+                record['cprofile'] = dump
+            with _lock:
+                _records.append(record)
+        record['rows_out'] = _count_rows(result)
+        return result
+
+    wrapper._histd_profiled = func
+    return wrapper
+
+def _install(modules):
+    """
+    Replace the public functions of each module with profiling wrappers
+
+    Parameter
+    ---------
+    modules : list
+        List of modules
+
+    Return
+    ------
+    list
+        List of (module, name, original function), to restore the modules
+    """
+    installed = []
+    for module in modules:
+        for name, func in inspect.getmembers(module, inspect.isfunction):
+            # only public functions defined in the module, not already wrapped
+            if ((name.startswith('_')) or
+                (func.__module__ != module.__name__) or
+                (hasattr(func, '_histd_profiled'))):
+                continue
+            setattr(module, name, _wrap(module.__name__, func))
+            installed.append((module, name, func))
+    return installed
+
+def _uninstall(installed):
+    """
+    Restore the original functions of profiled modules
+
+    Parameter
+    ---------
+    installed : list
+        Output of call to '_install'
+    """
+    for module, name, func in installed:
+        setattr(module, name, func)
+
+def get_profile_report():
+    """
+    Summarize the profile records of the current run by function
+
+    Return
+    ------
+    DataFrame
+        One row per function, slowest total wall time first
+    """
+    if (len(_records) == 0):
+        return pd.DataFrame()
+    df = pd.DataFrame.from_records(_records)
+    report = df.groupby('function').agg(calls=('function', 'size'),
+                                        wall_seconds=('wall_seconds', 'sum'),
+                                        cpu_seconds=('cpu_seconds', 'sum'),
+                                        max_wall_seconds=('wall_seconds', 'max'),
+                                        rows_in=('rows_in', 'sum'),
+                                        rows_out=('rows_out', 'sum'),
+                                        peak_memory_bytes=('peak_memory_bytes', 'max'))
+    return report.sort_values('wall_seconds', ascending=False).reset_index()
+
+def write_profile_report(filename):
+    """
+    Write the profile records and summary of the current run to a JSON file
+
+    Parameter
+    ---------
+    filename : str
+        Full path to report file
+
+    Return
+    ------
+    DataFrame
+        Output of call to 'get_profile_report'
+    """
+    report = get_profile_report()
+    with open(filename, 'w') as fp:
+        fp.write(json.dumps({'summary':json.loads(report.to_json(orient='records')),
+                             'calls':_records}, indent=2))
+    return report
+
+@contextlib.contextmanager
+def profile_functions(*modules, report=None, cprofile=None, cprofile_dir='.'):
+    """
+    Profile the public functions of one or more modules within a context
+    (memory and cProfile statistics: of calls in the calling thread only)
+
+    Parameters
+    ----------
+    modules : module
+        Modules to profile (e.g., util, curate, ddu)
+    report : str (optional)
+        Full path to report file, written when the context exits
+    cprofile : list (optional)
+        Names of functions to profile with cProfile
+    cprofile_dir : str (default: .)
+        Directory of cProfile dumps
+
+    Return
+    ------
+    list
+        Profile records of the run (one dict per call)
+    """
+    # start a new run
+    with _lock:
+        del _records[:]
+    _owner['thread'] = threading.get_ident()
+    _cprofile['names'] = set(cprofile or [])
+    _cprofile['directory'] = cprofile_dir
+    _cprofile['count'] = 0
+    tracing = tracemalloc.is_tracing()
+    if (not tracing):
+        tracemalloc.start()
+    installed = _install(modules)
+    try:
+        yield _records
+    finally:
+        _uninstall(installed)
+        if (not tracing):
+            tracemalloc.stop()
+        if (report):
+            write_profile_report(report)
+
+def enable_from_environment(*modules):
+    """
+    Profile the public functions of one or more modules until the process
+    exits, if the HISTD_PROFILE environment variable is set. The report is
+    written to the file named by HISTD_PROFILE (or to the default report
+    file, if set to 1) at exit.
+
+    Parameter
+    ---------
+    modules : module
+        Modules to profile (e.g., util, curate, ddu)
+
+    Return
+    ------
+    bool
+        Profiling is/not enabled
+    """
+    value = os.environ.get(PROFILE_ENV_VAR)
+    if ((not value) or
+        (value == '0')):
+        return False
+    report = DEFAULT_REPORT if (value == '1') else value
+    names = [name for name in os.environ.get(CPROFILE_ENV_VAR, '').split(',') if name]
+    context = profile_functions(*modules, report=report, cprofile=names,
+                                cprofile_dir=os.path.dirname(os.path.abspath(report)))
+    context.__enter__()
+    atexit.register(context.__exit__, None, None, None)
+    return True
+
+# end file
@@ -5,21 +5,24 @@ from collections import OrderedDict
 import configparser
 import json
 import math
-import osfclient
+import numpy as np
 import pandas as pd
 import pprint
 import re
-import requests
-import xmltodict
 
-def mets_to_dataframe(filename):
+# note: heavy dependencies that only some functions need (osfclient, PIL, requests, xmltodict)
+# are imported within those functions, so that importing this module stays fast
+
+def mets_to_dataframe(filename, cache_directory=None):
     """
     Read and extract information about files from an XML METS file.
 
     Parameter
     ---------
     filename : str
-        Full path to METS file.
+        Full path to METS file, or its url (fetched with 'fetch_url')
+    cache_directory : str (optional)
+        Full path to cache directory of fetched files
 
     Return
     ------
@@ -29,7 +32,10 @@ def mets_to_dataframe(filename):
     # validate filename
     if (not filename):
         return None
+    if (_is_url(filename)):
+        filename = fetch_url(filename, cache_directory=cache_directory)
     # read mets file
+    import xmltodict
     with open(filename) as fp:
         doc = xmltodict.parse(fp.read())
     # validate mets file
@@ -79,16 +85,229 @@ def mets_to_dataframe(filename):
                                    columns=['@id','file_type','@mimetype','mets_url','filename'])
     return df
 
+# default local cache of files fetched by url (e.g., IIIF manifests, METS files)
+HTTP_CACHE_DIRECTORY = '~/.cache/histd/http'
+HTTP_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+def _is_url(filename):
+    """
+    Check whether a filename is an http(s) url
+
+    Parameter
+    ---------
+    filename : str
+
+    Return
+    ------
+    bool
+    """
+    return (isinstance(filename, str) and
+            ((filename.startswith('http://')) or (filename.startswith('https://'))))
+
+def _http_cache_fetch(session, url, cache_directory, timeout=60):
+    """
+    Fetch a url into the local cache, revalidating a cached copy with
+    a conditional GET (If-None-Match/If-Modified-Since)
+
+    Parameters
+    ----------
+    session : requests.Session
+    url : str
+    cache_directory : str
+        Full path to cache directory (must exist)
+    timeout : int (default: 60)
+        Request timeout in seconds
+
+    Raise
+    -----
+    RuntimeError
+        Unexpected response from server
+
+    Return
+    ------
+    tuple
+        (full path to cached file, status: fetched, revalidated or modified)
+    """
+    import hashlib
+    import os
+
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    body_file = os.path.join(cache_directory, key)
+    meta_file = body_file + '.json'
+
+    # validators of the cached copy, if any
+    meta = {}
+    if ((os.path.exists(body_file)) and
+        (os.path.exists(meta_file))):
+        with open(meta_file) as fp:
+            meta = json.loads(fp.read())
+    headers = {}
+    if (meta.get('etag')):
+        headers['If-None-Match'] = meta.get('etag')
+    if (meta.get('last_modified')):
+        headers['If-Modified-Since'] = meta.get('last_modified')
+
+    response = session.get(url, headers=headers, timeout=timeout)
+    if ((response.status_code == 304) and
+        (meta)):
+        # unchanged: mark the cached copy as recently used
+        os.utime(body_file)
+        return body_file, 'revalidated'
+    if (response.status_code != 200):
+        msg = 'Response has status code {} for url: {}'.format(response.status_code, url)
+        raise RuntimeError(msg)
+
+    # write body then validators, each atomically
+    status = 'modified' if (meta) else 'fetched'
+    for filename, content in [(body_file, response.content),
+                              (meta_file, json.dumps({'url':url,
+                                                      'etag':response.headers.get('ETag'),
+                                                      'last_modified':response.headers.get('Last-Modified'),
+                                                      'size':len(response.content)}).encode('utf-8'))]:
+        temp_file = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(temp_file, 'wb') as fp:
+            fp.write(content)
+        os.replace(temp_file, filename)
+    return body_file, status
+
+def _http_cache_evict(cache_directory, max_bytes, keep=None):
+    """
+    Remove the least recently used files from the local cache until
+    its size is at most max_bytes
+
+    Parameters
+    ----------
+    cache_directory : str
+        Full path to cache directory
+    max_bytes : int
+        Maximum size of cached files
+    keep : list (optional)
+        Full paths of cached files not to remove (e.g., just fetched)
+
+    Return
+    ------
+    list
+        Full paths of removed files
+    """
+    import os
+
+    keep = set(keep or [])
+    entries = []
+    total = 0
+    for entry in os.scandir(cache_directory):
+        if ((not entry.is_file()) or
+            ('.' in entry.name)):
+            continue
+        status = entry.stat()
+        entries.append((status.st_mtime, status.st_size, entry.path))
+        total = total + status.st_size
+
+    removed = []
+    for mtime, size, path in sorted(entries):
+        if (total <= max_bytes):
+            break
+        if (path in keep):
+            continue
+        for filename in [path, path + '.json']:
+            if (os.path.exists(filename)):
+                os.remove(filename)
+        total = total - size
+        removed.append(path)
+    return removed
+
+def fetch_urls(urls, cache_directory=None, max_workers=8, max_bytes=HTTP_CACHE_MAX_BYTES):
+    """
+    Fetch files by url (e.g., IIIF manifests, METS files) into a local cache
+    with a bounded pool of threads. Cached files are revalidated with
+    conditional GETs, using their ETag and Last-Modified headers, so an
+    unchanged file is only downloaded once. The least recently used files
+    are removed when the cache is larger than max_bytes.
+
+    Parameters
+    ----------
+    urls : list
+        List of urls
+    cache_directory : str (optional)
+        Full path to cache directory (default: HTTP_CACHE_DIRECTORY)
+    max_workers : int (default: 8)
+        Maximum number of concurrent requests
+    max_bytes : int (default: HTTP_CACHE_MAX_BYTES)
+        Maximum size of cached files
+
+    Raise
+    -----
+    RuntimeError
+        Unexpected response from server
+
+    Return
+    ------
+    dict
+        Keyed on url: {filepath: str, status: fetched, revalidated or modified}
+    """
+    if (not urls):
+        return {}
+
+    import concurrent.futures
+    import os
+    import requests
+    import threading
+
+    cache_directory = os.path.expanduser(cache_directory or HTTP_CACHE_DIRECTORY)
+    os.makedirs(cache_directory, exist_ok=True)
+
+    # one session per thread (requests sessions are not thread-safe)
+    local = threading.local()
+    def fetch(url):
+        if (not hasattr(local, 'session')):
+            local.session = requests.Session()
+        return _http_cache_fetch(local.session, url, cache_directory)
+
+    results = {}
+    unique = list(dict.fromkeys(urls))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for url, (filepath, status) in zip(unique, executor.map(fetch, unique)):
+            results[url] = {'filepath':filepath, 'status':status}
+
+    _http_cache_evict(cache_directory, max_bytes, keep=[r.get('filepath') for r in results.values()])
+    return results
+
+def fetch_url(url, cache_directory=None, max_bytes=HTTP_CACHE_MAX_BYTES):
+    """
+    Fetch a file by url into a local cache (see 'fetch_urls')
+
+    Parameters
+    ----------
+    url : str
+    cache_directory : str (optional)
+        Full path to cache directory (default: HTTP_CACHE_DIRECTORY)
+    max_bytes : int (default: HTTP_CACHE_MAX_BYTES)
+        Maximum size of cached files
+
+    Raise
+    -----
+    RuntimeError
+        Unexpected response from server
+
+    Return
+    ------
+    str
+        Full path to cached file
+    """
+    if (not url):
+        return None
+    return fetch_urls([url], cache_directory=cache_directory, max_workers=1,
+                      max_bytes=max_bytes).get(url).get('filepath')
 
 def osf_get_project_files(project_id, username, password, token):
     """
     Get metadata about all files for this OSF project.
 
     Caution: This function makes many OSF API calls and may take a long time to run.
-    It is also does not handle multiple large folders of material, either. 
+    It is also does not handle multiple large folders of material, either.
     Use extreme caution when executing this function.
 
-    TO DO: refactor function to handle multiple top-level folders. 
+    Use 'osf_crawl_project_files' for large projects or projects with
+    multiple top-level folders.
 
     Parameters
     ----------
@@ -108,6 +327,7 @@ def osf_get_project_files(project_id, username, password, token):
         Keyed on filename
     """
     # initialize the osf client
+    import osfclient
     client = osfclient.OSF(username=username, password=password, token=token)
     # get the project
     project = client.project(project_id)
@@ -130,6 +350,171 @@ def osf_get_project_files(project_id, username, password, token):
         files[file.name] = fm
     return files
 
+def _osf_list_folder(session, url):
+    """
+    List the files and folders in a single OSF storage folder,
+    following pagination links.
+
+    Parameters
+    ----------
+    session : requests.Session
+    url : str
+        OSF API url of the folder's files listing
+
+    Raise
+    -----
+    RuntimeError
+        Unexpected response from OSF API
+
+    Return
+    ------
+    tuple
+        (list of file metadata dicts, list of folder dicts)
+    """
+    files = []
+    folders = []
+    # request the largest page size supported by the OSF API
+    params = {'page[size]':100}
+    while url:
+        response = session.get(url, params=params)
+        if (response.status_code != 200):
+            msg = 'Response has status code {} for url: {}'.format(response.status_code, url)
+            raise RuntimeError(msg)
+        doc = response.json()
+        for item in doc.get('data'):
+            attributes = item.get('attributes')
+            if (attributes.get('kind') == 'folder'):
+                folders.append({
+                    'path':attributes.get('materialized_path'),
+                    'date_modified':attributes.get('date_modified'),
+                    'files_url':item.get('relationships').get('files').get('links').get('related').get('href')
+                })
+            else:
+                name = attributes.get('name')
+                files.append({
+                    'name':name,
+                    'osf_path':attributes.get('path'),
+                    'path':attributes.get('materialized_path'),
+                    'html_url':item.get('links').get('html'),
+                    'size':attributes.get('size'),
+                    'date_created':attributes.get('date_created'),
+                    'date_modified':attributes.get('date_modified'),
+                    'file_type':name.split('.')[-1] if ('.' in name) else ''
+                })
+        # the next link is already paginated; do not resend params
+        url = doc.get('links').get('next')
+        params = None
+    return files, folders
+
+def osf_crawl_project_files(project_id, token=None, snapshot=None, max_workers=8, provider='osfstorage'):
+    """
+    Get metadata about all files for this OSF project by walking its folder
+    tree with a bounded pool of threads, following pagination links.
+
+    If a snapshot file is supplied, the folder listings are saved to it. On
+    later crawls, a folder whose date_modified (as listed by its parent in this
+    crawl) is unchanged since the snapshot is not requested again (assumes that
+    OSF updates a folder's date_modified when its contents change). The
+    subfolders of a reused folder are always requested, since their own
+    date_modified is only known from the snapshot.
+
+    Parameters
+    ----------
+    project_id : str
+        Valid OSF id for the project url to the project storage root (e.g., sjtg9)
+    token : str (optional)
+        Valid OSF API key, required for private projects.
+        Login to OSF and create your API key here: https://osf.io/settings/tokens
+    snapshot : str (optional)
+        Full path to JSON snapshot file of folder listings
+    max_workers : int (default: 8)
+        Maximum number of concurrent OSF API requests
+    provider : str (default: osfstorage)
+        OSF storage provider
+
+    Raise
+    -----
+    RuntimeError
+        Unexpected response from OSF API
+
+    Return
+    ------
+    dict :
+        Keyed on file path, same format as values of 'osf_get_project_files'
+        (e.g., can be passed to 'osf_files_to_dataframe')
+    """
+    # validate parameters
+    if (not project_id):
+        return {}
+
+    import concurrent.futures
+    import os
+    import requests
+    import threading
+
+    # load previous folder listings, if any
+    previous = {}
+    if (snapshot and os.path.exists(snapshot)):
+        with open(snapshot) as fp:
+            doc = json.loads(fp.read())
+        if (doc.get('project_id') == project_id):
+            previous = doc.get('folders') or {}
+
+    # one session per thread (requests sessions are not thread-safe)
+    local = threading.local()
+    def get_session():
+        if (not hasattr(local, 'session')):
+            local.session = requests.Session()
+            local.session.headers.update({'Accept':'application/vnd.api+json'})
+            if (token):
+                local.session.headers.update({'Authorization':'Bearer {}'.format(token)})
+        return local.session
+
+    # list a folder, or reuse its previous listing if it is unchanged
+    # (live: the folder's metadata comes from a listing of its parent in this crawl)
+    def list_folder(folder, live):
+        cached = previous.get(folder.get('path'))
+        if ((live) and
+            (cached) and
+            (folder.get('date_modified')) and
+            (cached.get('date_modified') == folder.get('date_modified'))):
+            return folder, cached.get('files'), cached.get('folders'), False
+        files, folders = _osf_list_folder(get_session(), folder.get('files_url'))
+        return folder, files, folders, True
+
+    # the storage root is always listed
+    root = {
+        'path':'/',
+        'date_modified':None,
+        'files_url':'https://api.osf.io/v2/nodes/{}/files/{}/'.format(project_id, provider)
+    }
+
+    # walk the folder tree, submitting subfolders as they are discovered
+    listings = {}
+    files = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(list_folder, root, True)}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                folder, folder_files, subfolders, listed = future.result()
+                listings[folder.get('path')] = {
+                    'date_modified':folder.get('date_modified'),
+                    'files':folder_files,
+                    'folders':subfolders
+                }
+                for fm in folder_files:
+                    files[fm.get('path')] = fm
+                for subfolder in subfolders:
+                    pending.add(executor.submit(list_folder, subfolder, listed))
+
+    # save the folder listings
+    if (snapshot):
+        with open(snapshot, 'w') as fp:
+            fp.write(json.dumps({'project_id':project_id, 'folders':listings}))
+
+    return files
+
 def osf_files_to_dataframe(files):
     """
     Save metadata about project files to a `DataFrame`.
@@ -203,14 +588,16 @@ def map_csv_to_image(image_list, csv_list):
     # otherwise, return results
     return results
 
-def iiif_to_dataframe(filename):
+def iiif_to_dataframe(filename, cache_directory=None):
     """
     Given a IIIF JSON manifest, save some of its values to a DataFrame
 
     Parameter
     ---------
     filename : str
-        Full path to IIIF JSON manifest file.
+        Full path to IIIF JSON manifest file, or its url (fetched with 'fetch_url')
+    cache_directory : str (optional)
+        Full path to cache directory of fetched files
 
     Return
     ------
@@ -220,6 +607,8 @@ def iiif_to_dataframe(filename):
     # validate filename
     if (not filename):
         return None
+    if (_is_url(filename)):
+        filename = fetch_url(filename, cache_directory=cache_directory)
     # read iiif json file
     with open(filename) as fp:
         doc = json.loads(fp.read())
@@ -285,18 +674,20 @@ def create_digital_object_inventory(inventory_df, itype='iiif'):
         # rename columns appropriately
         df.rename(columns = {'@id':'url','format':'mimetype'},errors='raise',inplace=True)
         # create a file_type column (derived from format/mimetype)
-        df['file_type'] = ''
-        for row in df.iterrows():
-            index = row[0]
-            mimetype = row[1]['mimetype']
-            file_type = mimetype.split('/')[0]
-            df.at[index, 'file_type'] = file_type
+        df['file_type'] = df['mimetype'].str.split('/', n=1).str[0].astype('category')
+        df['mimetype'] = df['mimetype'].astype('category')
 
     # if inventory is from drs file, there is nothing to do
     # ...
 
     return df
 
+# drs id: filename up to the first '.' or '_' (e.g., 44319578_24-25_a.csv)
+_DRS_ID_REGEX = re.compile(r'^([^._]*)')
+
+# filename stem: owner-supplied name up to the page number (e.g., 000000001_pt1_00024_a.csv)
+_FILENAME_STEM_REGEX = re.compile(r'^(\d+_\S+_\d+)[_|.]')
+
 def create_vendor_inventory(mets_df, drsids=True, path=None):
     """
     Given a DataFrame of METS information (retrieved from 'mets_to_dataframe'),
@@ -310,6 +701,9 @@ def create_vendor_inventory(mets_df, drsids=True, path=None):
     drsids : bool
         Parse and output DRS ids (default, True)
         Assumes that mets_df contains DRS ids
+        If False, output filename stems, and whether each filename
+        matched the expected pattern (column filename_matched;
+        filename_stem is null for filenames that did not)
     path : str (optional)
         Full path to directory of data files
     
@@ -330,31 +724,28 @@ def create_vendor_inventory(mets_df, drsids=True, path=None):
     
     # if file paths, apply them
     if (filepaths):
-        df['filepath'] = df.apply(lambda row: path + '/' + row.mets_url, axis=1)
+        df['filepath'] = path + '/' + df['mets_url']
         # add column to df
-        df['path'] = path
+        df['path'] = pd.Categorical([path] * len(df))
     
     # if drsids are present, process them
     if (drsids == True):
-        # create drs ids by removing file extension
+        # create drs ids by removing file extension and suffixes
         # assumes that the filenames are based upon the drs id
-        splitnames = df['filename'].str.split('.')
-        drs_ids = splitnames.apply(lambda x : x[0])
-        import re
-        drs_ids = drs_ids.apply(lambda x : re.sub(r'_.*$', '', x))
-        df['drs_id'] = drs_ids
+        df['drs_id'] = df['filename'].str.extract(_DRS_ID_REGEX, expand=False)
     
     # if drsids are not present, process filename stems
     if (drsids == False):
-        import re
-        stems = df['filename'].apply(lambda x : re.match(r'^[\d]+_[\S]+_[\d]+[_|.]', x))
-        df['filename_stem'] = stems.apply(lambda x : re.sub(r'[_|.]$', '', x[0]))
+        df['filename_stem'] = df['filename'].str.extract(_FILENAME_STEM_REGEX, expand=False)
+        df['filename_matched'] = df['filename_stem'].notna()
     
     # drop unneeded columns
     df = df.drop(columns = ['@id','mets_url'])
     
     # rename columns appropriately
     df.rename(columns = {'@mimetype':'mimetype'},errors='raise',inplace=True)
+    df['file_type'] = df['file_type'].astype('category')
+    df['mimetype'] = df['mimetype'].astype('category')
     return df
 
 def find_missing_reference_ids(do_ref_ids, vendor_ref_ids):
@@ -523,6 +914,176 @@ def generate_transcription_report(transcription_df, drsids=True):
     df = pd.DataFrame.from_records(list(data.values()))
     return df
 
+def iter_mets_files(filename, batch_size=100000, cache_directory=None):
+    """
+    Stream-parse an XML METS file and yield information about its files
+    in batches (same columns as 'mets_to_dataframe'). Elements are discarded
+    as soon as they are read, so memory use is bounded by the batch size.
+
+    Parameters
+    ----------
+    filename : str
+        Full path to METS file, or its url (fetched with 'fetch_url')
+    batch_size : int (default: 100000)
+        Number of files per batch
+    cache_directory : str (optional)
+        Full path to cache directory of fetched files
+
+    Return
+    ------
+    generator
+        DataFrames of at most batch_size rows
+    """
+    # validate filename
+    if (not filename):
+        return
+    if (_is_url(filename)):
+        filename = fetch_url(filename, cache_directory=cache_directory)
+
+    import xml.etree.ElementTree as ET
+    columns = ['@id','file_type','@mimetype','mets_url','filename']
+    rows = []
+    file_type = None
+    # open elements, to discard the children of each element once read
+    stack = []
+    for event, elem in ET.iterparse(filename, events=('start','end')):
+        # ignore the namespace
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if (event == 'start'):
+            stack.append(elem)
+            if (tag == 'fileGrp'):
+                file_type = elem.get('USE')
+            continue
+        stack.pop()
+        if (tag == 'file'):
+            row = {'@id':elem.get('ID'), 'file_type':file_type, '@mimetype':elem.get('MIMETYPE'),
+                   'mets_url':None, 'filename':None}
+            for child in elem:
+                if (child.tag.rsplit('}', 1)[-1] == 'FLocat'):
+                    for key, value in child.attrib.items():
+                        if (key.rsplit('}', 1)[-1] == 'href'):
+                            row['mets_url'] = value
+                            row['filename'] = value.split('/')[1]
+            rows.append(row)
+            if (len(rows) >= batch_size):
+                yield pd.DataFrame.from_records(rows, columns=columns)
+                rows = []
+        elif (tag == 'fileGrp'):
+            file_type = None
+        # discard the element, unless its parent is a file that has not been read yet
+        if ((stack) and
+            (stack[-1].tag.rsplit('}', 1)[-1] != 'file')):
+            del stack[-1][:]
+    if (len(rows) > 0):
+        yield pd.DataFrame.from_records(rows, columns=columns)
+
+def iter_vendor_inventory(filename, drsids=True, path=None, batch_size=100000, cache_directory=None):
+    """
+    Stream a vendor inventory from an XML METS file in batches
+    (see 'iter_mets_files' and 'create_vendor_inventory')
+
+    Parameters
+    ----------
+    filename : str
+        Full path to METS file, or its url
+    drsids : bool
+        Parse and output DRS ids (default, True)
+    path : str (optional)
+        Full path to directory of data files
+    batch_size : int (default: 100000)
+        Number of files per batch
+    cache_directory : str (optional)
+        Full path to cache directory of fetched files
+
+    Return
+    ------
+    generator
+        DataFrames of at most batch_size rows
+    """
+    for mets_df in iter_mets_files(filename, batch_size=batch_size, cache_directory=cache_directory):
+        yield create_vendor_inventory(mets_df, drsids=drsids, path=path)
+
+def iter_transcription_report(transcription_batches, drsids=True):
+    """
+    Generate a transcription report from batches of a transcription inventory
+    (e.g., from 'iter_vendor_inventory' and 'extract_transcription_inventory').
+    The rows of the last DRS id (or filename stem) of each batch are carried
+    over to the next batch, so that each report row covers all of its files.
+    Assumes that the files of a page are contiguous, as in vendor METS files.
+
+    Parameters
+    ----------
+    transcription_batches : iterable
+        DataFrames of the transcription inventory
+    drsids : bool (default = True)
+        The inventory does/not contain DRS ids
+
+    Return
+    ------
+    generator
+        DataFrames of the report (see 'generate_transcription_report')
+    """
+    key = 'drs_id' if (drsids == True) else 'filename_stem'
+    carry = None
+    for batch_df in transcription_batches:
+        if (batch_df.empty == True):
+            continue
+        if (carry is not None):
+            batch_df = pd.concat([carry, batch_df])
+        last = batch_df[key].iloc[-1]
+        is_last = (batch_df[key] == last)
+        carry = batch_df.loc[is_last]
+        report_df = generate_transcription_report(batch_df.loc[~is_last], drsids=drsids)
+        if (report_df.empty == False):
+            yield report_df
+    if (carry is not None):
+        yield generate_transcription_report(carry, drsids=drsids)
+
+def write_batches(batches, csv_file=None, parquet_file=None):
+    """
+    Write batches of a DataFrame (e.g., from 'iter_vendor_inventory') to
+    a CSV file and/or a Parquet file, appending one batch at a time
+
+    Parameters
+    ----------
+    batches : iterable
+        DataFrames with the same columns
+    csv_file : str (optional)
+        Full path to CSV output file
+    parquet_file : str (optional)
+        Full path to Parquet output file (requires pyarrow)
+
+    Return
+    ------
+    int
+        Number of rows written
+    """
+    count = 0
+    writer = None
+    try:
+        for batch_df in batches:
+            if (batch_df.empty == True):
+                continue
+            if (csv_file):
+                batch_df.to_csv(csv_file, mode='w' if (count == 0) else 'a', header=(count == 0), index=False)
+            if (parquet_file):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                # categories differ between batches: write their values
+                categories = [c for c in batch_df.columns if isinstance(batch_df[c].dtype, pd.CategoricalDtype)]
+                batch_df = batch_df.astype({c:object for c in categories})
+                if (writer is None):
+                    table = pa.Table.from_pandas(batch_df, preserve_index=False)
+                    writer = pq.ParquetWriter(parquet_file, table.schema)
+                else:
+                    table = pa.Table.from_pandas(batch_df, schema=writer.schema, preserve_index=False)
+                writer.write_table(table)
+            count = count + len(batch_df)
+    finally:
+        if (writer is not None):
+            writer.close()
+    return count
+
 def find_missing_transcription_reference_ids(do_inventory_df, transcription_report_df, reftype='drs'):
     """
     Generated a report based upon an inventory of vendor transcription files
@@ -588,14 +1149,150 @@ def find_missing_transcription_reference_ids(do_inventory_df, transcription_repo
 
     return df
 
-def drs_inventory_to_dataframe(filename):
+def _reference_ids(values):
+    """
+    Get the non-null reference ids of a column as strings (e.g., DRS ids may be
+    read as integers, or as floats if some are missing)
+
+    Parameter
+    ---------
+    values : Series
+
+    Return
+    ------
+    Series
+        Indexed like the non-null values
+    """
+    ids = values.dropna()
+    if ((pd.api.types.is_float_dtype(ids)) and
+        ((ids == ids.round()).all())):
+        ids = ids.astype('int64')
+    return ids.astype(str)
+
+def reconcile_inventories(do_inventory_df, vendor_inventory_df, drs_inventory_df=None, refid='drs_id'):
+    """
+    Reconcile the digital object, vendor, and (optionally) DRS inventories
+    with a single outer join on the reference id and report the status of
+    every reference id rather than stopping at the first anomaly.
+
+    Status values per file type (and for the DRS inventory):
+        present : reference id is in the digital object and has files
+        missing : reference id is in the digital object but has no files
+        extra : reference id has files but is not in the digital object
+
+    Overall status values:
+        extra : reference id is not in the digital object
+        duplicate : reference id appears more than once in the digital object
+        missing : reference id has no vendor files
+        ok : otherwise
+
+    Rows without a reference id (null) are ignored.
+
+    Parameters
+    ----------
+    do_inventory_df : DataFrame
+        Output of call to 'create_digital_object_inventory'
+    vendor_inventory_df : DataFrame
+        Output of call to 'create_vendor_inventory'
+    drs_inventory_df : DataFrame (optional)
+        DRS inventory containing the reference id column
+    refid : str (default: drs_id)
+        Name of the reference id column (e.g., 'drs_id' or 'filename_stem')
+
+    Raises
+    ------
+    KeyError
+        Missing required field in DataFrame
+
+    Return
+    ------
+    DataFrame
+        One row per reference id found in any inventory
+    """
+    # check for empty inventories
+    if (do_inventory_df.empty == True):
+        return pd.DataFrame()
+    if (vendor_inventory_df.empty == True):
+        return pd.DataFrame()
+
+    # check for required fields
+    if ((not refid in do_inventory_df.columns) or
+        (not refid in vendor_inventory_df.columns) or
+        (not 'file_type' in vendor_inventory_df.columns)):
+        raise KeyError('Missing required field: {} or file_type in DataFrame'.format(refid))
+    if ((drs_inventory_df is not None) and
+        (not refid in drs_inventory_df.columns)):
+        raise KeyError('Missing required field: {} in DataFrame'.format(refid))
+
+    # count the digital object files per reference id
+    # note: reference ids are compared as strings (e.g., DRS ids may be read as integers)
+    do_counts = _reference_ids(do_inventory_df[refid]).value_counts().rename('do_count')
+
+    # count the vendor files per reference id and file type
+    # note: the index of concatenated inventories may repeat, so align by position
+    vendor_df = vendor_inventory_df[[refid, 'file_type']].reset_index(drop=True)
+    vendor_ids = _reference_ids(vendor_df[refid])
+    vendor_counts = vendor_df.loc[vendor_ids.index].groupby(
+        [vendor_ids, 'file_type'], observed=True).size().unstack(fill_value=0)
+    file_types = list(vendor_counts.columns)
+    vendor_counts.columns = ['vendor_{}_count'.format(ft) for ft in file_types]
+
+    # collect the counts to join
+    counts = [do_counts, vendor_counts]
+    if (drs_inventory_df is not None):
+        counts.append(_reference_ids(drs_inventory_df[refid]).value_counts().rename('drs_count'))
+
+    # outer join all counts on the reference id
+    df = pd.concat(counts, axis=1, join='outer', sort=True)
+    df = df.fillna(0).astype('int64')
+    df.index.name = refid
+
+    # total number of vendor files
+    vendor_cols = ['vendor_{}_count'.format(ft) for ft in file_types]
+    df['vendor_count'] = df[vendor_cols].sum(axis=1)
+
+    # reference id is/not in the digital object
+    in_do = df['do_count'] > 0
+
+    # status of each file type
+    def status(count):
+        return np.select([in_do & (count > 0), in_do & (count == 0), (~in_do) & (count > 0)],
+                         ['present', 'missing', 'extra'], default='')
+    for ft in file_types:
+        df['{}_status'.format(ft)] = status(df['vendor_{}_count'.format(ft)])
+    if (drs_inventory_df is not None):
+        df['drs_status'] = status(df['drs_count'])
+
+    # duplicate counts
+    df['do_duplicate_count'] = (df['do_count'] - 1).clip(lower=0)
+    if (drs_inventory_df is not None):
+        df['drs_duplicate_count'] = (df['drs_count'] - 1).clip(lower=0)
+
+    # overall status
+    df['status'] = np.select([~in_do, df['do_count'] > 1, df['vendor_count'] == 0],
+                             ['extra', 'duplicate', 'missing'], default='ok')
+
+    return df.reset_index()
+
+def drs_inventory_to_dataframe(filename, osn_prefix=None, object_ids=None, columns=None, chunksize=100000):
     """
     Read and extract information about files from DRS inventory file.
+    The file is read in chunks, keeping only the needed columns and
+    the rows that match the filters, so that large (e.g., repository-wide)
+    DRS exports can be read in bounded memory.
 
     Parameter
     ---------
     drs_inventory : str
         Full path to DRS inventory filename 
+    osn_prefix : str or tuple (optional)
+        Keep only files whose owner-supplied names start with the prefix(es)
+    object_ids : list (optional)
+        Keep only files of the DRS objects (column 'object_id_num')
+    columns : list (optional)
+        Additional DRS columns to keep, as named in the inventory file
+    chunksize : int (default: 100000)
+        Number of rows read at a time
    
     Return
     ------
@@ -608,16 +1305,38 @@ def drs_inventory_to_dataframe(filename):
     cols = ['file_huldrsadmin_ownerSuppliedName_string',
             'file_mets_mimetype_string',
             'file_huldrsadmin_uri_string_sort']
-
-    # read the inventory file
-    df = pd.read_csv(filename,delimiter=',',usecols=cols)
+    extra = [col for col in (columns or []) if (col not in cols)]
+    usecols = cols + extra
+    if ((object_ids is not None) and
+        ('object_id_num' not in usecols)):
+        usecols = usecols + ['object_id_num']
+    if (isinstance(osn_prefix, list)):
+        osn_prefix = tuple(osn_prefix)
+    if (object_ids is not None):
+        object_ids = set([str(object_id) for object_id in object_ids])
+
+    # read the inventory file, filtering each chunk
+    chunks = []
+    reader = pd.read_csv(filename,delimiter=',',usecols=usecols,
+                         dtype={col:str for col in usecols},chunksize=chunksize)
+    for chunk in reader:
+        if (osn_prefix):
+            chunk = chunk[chunk['file_huldrsadmin_ownerSuppliedName_string'].str.startswith(osn_prefix, na=False)]
+        if (object_ids is not None):
+            chunk = chunk[chunk['object_id_num'].isin(object_ids)]
+        chunks.append(chunk)
+    if (len(chunks) > 0):
+        df = pd.concat(chunks, ignore_index=True)
+    else:
+        df = pd.DataFrame(columns=usecols, dtype=str)
+    df = df[cols + extra]
 
     # rename columns
     new_names = {'file_huldrsadmin_ownerSuppliedName_string':'filename_stem',
                 'file_mets_mimetype_string':'mimetype',
                 'file_huldrsadmin_uri_string_sort':'url'}
     df.rename(columns=new_names,inplace=True)
-    df['url'] = df.apply(lambda row: 'https://nrs.harvard.edu/' + row.url, axis=1)
+    df['url'] = 'https://nrs.harvard.edu/' + df['url']
 
     return df
 
@@ -773,5 +1492,1125 @@ def rename_vendor_files(vendor_osn_inventory_df):
 
     return True
 
+def _map_files(func, filepaths, max_workers=None):
+    """
+    Apply a function to each file in a pool of processes
+
+    Parameters
+    ----------
+    func : function
+        Module-level function taking a file path
+    filepaths : list
+        List of full paths to files
+    max_workers : int (optional)
+        Maximum number of processes (default: number of CPUs)
+
+    Return
+    ------
+    list
+        Results, in the order of filepaths
+    """
+    import concurrent.futures
+    import os
+    workers = max_workers or os.cpu_count() or 1
+    # send the files to the processes in chunks to limit overhead
+    chunksize = max(1, len(filepaths) // (8 * workers))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, filepaths, chunksize=chunksize))
+
+def _read_jpeg_header(filepath):
+    """
+    Read the markers of a JPEG file up to the start of its image data, and its
+    final bytes, without decoding the image.
+
+    Parameter
+    ---------
+    filepath : str
+        Full path to JPEG file
+
+    Return
+    ------
+    dict
+        Header information: file size, width, height, components,
+        truncated, corrupt, and error message
+    """
+    info = {'filepath':filepath, 'file_size':None, 'width':None, 'height':None,
+            'components':None, 'truncated':False, 'corrupt':False, 'error':''}
+    # start of frame markers (excluding DHT, JPG and DAC)
+    sof_markers = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+    try:
+        with open(filepath, 'rb') as fp:
+            # get the file size
+            fp.seek(0, 2)
+            size = fp.tell()
+            info['file_size'] = size
+            fp.seek(0)
+            # check the start of image marker
+            if (fp.read(2) != b'\xff\xd8'):
+                info['corrupt'] = True
+                info['error'] = 'Missing start of image marker'
+                return info
+            # read markers until the start of scan
+            while True:
+                prefix = fp.read(1)
+                if (not prefix):
+                    info['truncated'] = True
+                    info['error'] = 'Unexpected end of file in header'
+                    return info
+                if (prefix != b'\xff'):
+                    info['corrupt'] = True
+                    info['error'] = 'Invalid marker at offset {}'.format(fp.tell() - 1)
+                    return info
+                # skip fill bytes
+                marker = fp.read(1)
+                while (marker == b'\xff'):
+                    marker = fp.read(1)
+                if (not marker):
+                    info['truncated'] = True
+                    info['error'] = 'Unexpected end of file in header'
+                    return info
+                code = marker[0]
+                # markers without a segment
+                if ((code == 0x01) or
+                    (0xD0 <= code <= 0xD7)):
+                    continue
+                if (code == 0xD9):
+                    info['corrupt'] = True
+                    info['error'] = 'End of image marker before image data'
+                    return info
+                # segment length includes the two length bytes
+                length = fp.read(2)
+                if (len(length) < 2):
+                    info['truncated'] = True
+                    info['error'] = 'Unexpected end of file in header'
+                    return info
+                length = int.from_bytes(length, 'big')
+                if (length < 2):
+                    info['corrupt'] = True
+                    info['error'] = 'Invalid segment length at offset {}'.format(fp.tell() - 2)
+                    return info
+                # start of scan: image data follows
+                if (code == 0xDA):
+                    break
+                # start of frame: precision, height, width, components
+                if (code in sof_markers):
+                    frame = fp.read(6)
+                    if (len(frame) < 6):
+                        info['truncated'] = True
+                        info['error'] = 'Unexpected end of file in header'
+                        return info
+                    info['height'] = int.from_bytes(frame[1:3], 'big')
+                    info['width'] = int.from_bytes(frame[3:5], 'big')
+                    info['components'] = frame[5]
+                    fp.seek(length - 8, 1)
+                else:
+                    fp.seek(length - 2, 1)
+                if (fp.tell() > size):
+                    info['truncated'] = True
+                    info['error'] = 'Unexpected end of file in header'
+                    return info
+            # image dimensions are required
+            if (info['width'] is None):
+                info['corrupt'] = True
+                info['error'] = 'Missing start of frame marker'
+                return info
+            if ((info['width'] == 0) or
+                (info['height'] == 0)):
+                info['corrupt'] = True
+                info['error'] = 'Invalid image dimensions'
+                return info
+            # check the end of image marker (ignoring trailing padding)
+            fp.seek(max(size - 1024, 0))
+            tail = fp.read().rstrip(b'\x00')
+            if (not tail.endswith(b'\xff\xd9')):
+                info['truncated'] = True
+                info['error'] = 'Missing end of image marker'
+    except OSError as error:
+        info['corrupt'] = True
+        info['error'] = str(error)
+    return info
+
+def validate_vendor_images(vendor_inventory_df, two_page_ratio=1.2, max_workers=None):
+    """
+    Validate the image files of a vendor inventory by reading only their
+    JPEG headers and end of image markers (images are not decoded),
+    using a pool of processes.
+
+    Parameters
+    ----------
+    vendor_inventory_df : DataFrame
+        Vendor inventory with file paths, as output from call to:
+        `create_vendor_inventory(..., path=...)`
+    two_page_ratio : float (default: 1.2)
+        Minimum width/height ratio of an image that may contain two pages
+    max_workers : int (optional)
+        Maximum number of processes (default: number of CPUs)
+
+    Raise
+    -----
+    KeyError
+        Missing required field: filepath in DataFrame
+
+    Return
+    ------
+    DataFrame
+        One row per image, indexed like the inventory, with columns:
+        width, height, components, file_size, aspect_ratio, two_page,
+        truncated, corrupt, valid, error
+    """
+    # check for empty inventory
+    if (vendor_inventory_df.empty == True):
+        return pd.DataFrame()
+    # check for required fields
+    if ((not 'filepath' in vendor_inventory_df.columns) or
+        (not 'file_type' in vendor_inventory_df.columns)):
+        raise KeyError('Missing required field: filepath or file_type in DataFrame')
+
+    # get the images
+    images_df = vendor_inventory_df.loc[vendor_inventory_df['file_type'] == 'image']
+    if (images_df.empty == True):
+        return pd.DataFrame()
+
+    # read the image headers in parallel
+    headers = _map_files(_read_jpeg_header, images_df['filepath'].tolist(), max_workers=max_workers)
+
+    # join the results to the inventory
+    results_df = pd.DataFrame.from_records(headers, index=images_df.index).drop(columns=['filepath'])
+    results_df = results_df.astype({'file_size':'Int64', 'width':'Int64', 'height':'Int64', 'components':'Int64'})
+    results_df['aspect_ratio'] = results_df['width'] / results_df['height']
+    results_df['two_page'] = results_df['aspect_ratio'] >= two_page_ratio
+    results_df['valid'] = ~(results_df['truncated'] | results_df['corrupt'])
+    columns = [c for c in ['drs_id','filename_stem','filename','filepath'] if c in images_df.columns]
+    df = images_df[columns].join(results_df)
+    return df
+
+def _hash_image(filepath):
+    """
+    Compute the MD5 checksum of an image file and a 64-bit perceptual
+    difference hash (dHash) of its content. The JPEG is decoded at reduced
+    scale (DCT scaling), so that only a small grayscale image is held in memory.
+
+    Parameter
+    ---------
+    filepath : str
+        Full path to image file
+
+    Return
+    ------
+    dict
+        {filepath, md5, dhash (hex str, or None), error}
+    """
+    import hashlib
+    import io
+    from PIL import Image
+
+    info = {'filepath':filepath, 'md5':None, 'dhash':None, 'error':''}
+    try:
+        with open(filepath, 'rb') as fp:
+            data = fp.read()
+    except OSError as error:
+        info['error'] = str(error)
+        return info
+    info['md5'] = hashlib.md5(data).hexdigest()
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft('L', (64, 64))
+            pixels = img.convert('L').resize((9, 8), Image.BILINEAR).tobytes()
+    except Exception as error:
+        info['error'] = str(error)
+        return info
+
+    # one bit per pixel: brighter than its right neighbour
+    dhash = 0
+    for row in range(8):
+        for col in range(8):
+            dhash = (dhash << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    info['dhash'] = '{:016x}'.format(dhash)
+    return info
+
+def _hamming_distances(a, b):
+    """
+    Count the differing bits of pairs of 64-bit hashes
+
+    Parameters
+    ----------
+    a, b : ndarray
+        Arrays of uint64 hashes, of equal length
+
+    Return
+    ------
+    ndarray
+    """
+    xor = np.bitwise_xor(a, b)
+    if (hasattr(np, 'bitwise_count')):
+        return np.bitwise_count(xor)
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+def _hex_to_uint64(values):
+    """
+    Convert 16-digit hex strings to an array of uint64
+
+    Parameter
+    ---------
+    values : list or Series
+
+    Return
+    ------
+    ndarray
+    """
+    return np.frombuffer(bytes.fromhex(''.join(values)), dtype='>u8').astype(np.uint64)
+
+def find_duplicate_images(vendor_inventory_df, max_distance=4, max_workers=None):
+    """
+    Find duplicate and near-duplicate page images in a vendor inventory
+    (or in several inventories, concatenated, to compare deliveries),
+    using a pool of processes to hash the images.
+
+    Exact duplicates have the same MD5 checksum. Near duplicates have
+    perceptual hashes (dHash, 64 bits) that differ by at most max_distance
+    bits. The hashes are indexed by max_distance + 1 bands of bits, since
+    two hashes within max_distance bits must agree on at least one band,
+    so only hashes that share a band are compared.
+
+    Parameters
+    ----------
+    vendor_inventory_df : DataFrame
+        Vendor inventory with file paths, as output from call to:
+        `create_vendor_inventory(..., path=...)` or `map_drs_vendor_inventory`
+    max_distance : int (default: 4)
+        Maximum number of differing bits of near-duplicate perceptual hashes
+    max_workers : int (optional)
+        Maximum number of processes (default: number of CPUs)
+
+    Raise
+    -----
+    KeyError
+        Missing required field: filepath or file_type in DataFrame
+
+    Return
+    ------
+    DataFrame
+        One row per image in a cluster of duplicates, indexed like the
+        inventory, with columns: drs_id, filename_osn (if present), filename,
+        filepath, md5, dhash (hex), cluster, cluster_size, exact (another image
+        of the cluster has the same checksum), distance (bits from the
+        cluster's first image with a perceptual hash)
+    """
+    # check for empty inventory
+    if (vendor_inventory_df.empty == True):
+        return pd.DataFrame()
+    # check for required fields
+    if ((not 'filepath' in vendor_inventory_df.columns) or
+        (not 'file_type' in vendor_inventory_df.columns)):
+        raise KeyError('Missing required field: filepath or file_type in DataFrame')
+
+    # get the images
+    images_df = vendor_inventory_df.loc[vendor_inventory_df['file_type'] == 'image']
+    if (images_df.empty == True):
+        return pd.DataFrame()
+
+    # hash the images in parallel
+    hashes = pd.DataFrame.from_records(_map_files(_hash_image, images_df['filepath'].tolist(), max_workers=max_workers),
+                                       columns=['filepath','md5','dhash','error'])
+    count = len(hashes)
+
+    # union-find over image positions
+    parent = np.arange(count)
+    def find(i):
+        while (parent[i] != i):
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    def union(i, j):
+        i = find(i)
+        j = find(j)
+        if (i != j):
+            parent[max(i, j)] = min(i, j)
+
+    # exact duplicates, and images with identical perceptual hashes
+    for column in ['md5', 'dhash']:
+        duplicated = hashes.loc[hashes[column].notna() & hashes[column].duplicated(keep=False), column]
+        for group in duplicated.groupby(duplicated, sort=False).indices.values():
+            for i in group[1:]:
+                union(duplicated.index[group[0]], duplicated.index[i])
+
+    # near duplicates: compare the distinct perceptual hashes that share a band of bits
+    first = hashes.loc[hashes['dhash'].notna(), 'dhash'].drop_duplicates()
+    values = _hex_to_uint64(first)
+    positions = first.index.to_numpy()
+    if ((max_distance > 0) and
+        (len(values) > 1)):
+        bands = max_distance + 1
+        width = 64 // bands
+        for band in range(bands):
+            bits = (64 - band * width) if (band == bands - 1) else width
+            keys = (values >> np.uint64(band * width)) & np.uint64((1 << bits) - 1)
+            # sort by band, then compare each hash to the hashes 1, 2, ... places after it
+            # while any still share its band (memory linear in the number of hashes)
+            order = np.argsort(keys, kind='stable')
+            keys = keys[order]
+            offset = 1
+            while (offset < len(keys)):
+                same = np.flatnonzero(keys[:-offset] == keys[offset:])
+                if (len(same) == 0):
+                    break
+                k = order[same]
+                m = order[same + offset]
+                near = _hamming_distances(values[k], values[m]) <= max_distance
+                for i, j in zip(positions[k[near]], positions[m[near]]):
+                    union(i, j)
+                offset = offset + 1
+
+    # clusters of more than one image
+    hashes['cluster'] = [find(i) for i in range(count)]
+    hashes['cluster_size'] = hashes.groupby('cluster')['cluster'].transform('size')
+    hashes['exact'] = hashes.groupby(['cluster', 'md5'])['md5'].transform('size') > 1
+    hashes = hashes.loc[hashes['cluster_size'] > 1].copy()
+    if (hashes.empty == True):
+        return pd.DataFrame()
+
+    # distance to the first image of the cluster
+    first = hashes.groupby('cluster')['dhash'].transform('first')
+    known = hashes['dhash'].notna() & first.notna()
+    hashes['distance'] = pd.Series(pd.NA, index=hashes.index, dtype='Int64')
+    if (known.any()):
+        hashes.loc[known, 'distance'] = _hamming_distances(_hex_to_uint64(hashes.loc[known, 'dhash']),
+                                                           _hex_to_uint64(first.loc[known]))
+    hashes['cluster'] = pd.factorize(hashes['cluster'])[0]
+
+    # join by position (the index of concatenated inventories may repeat)
+    columns = [c for c in ['drs_id','filename_stem','filename_osn','filename','filepath'] if c in images_df.columns]
+    df = images_df[columns].iloc[hashes.index]
+    hashes.index = df.index
+    df = pd.concat([df, hashes.drop(columns=['filepath','error'])], axis=1)
+    return df.sort_values(['cluster', 'distance'])
+
+def _parse_alto(filepath, text=True):
+    """
+    Stream-parse an ALTO XML file and extract its text and word confidences.
+    Elements are discarded as soon as they are read, so memory use is bounded
+    by the size of a single text line.
+
+    Parameters
+    ----------
+    filepath : str
+        Full path to ALTO file
+    text : bool (default: True)
+        Return the page text (lines separated by newlines)
+
+    Return
+    ------
+    dict
+        Text, word count, mean and min word confidence, and error message
+    """
+    import xml.etree.ElementTree as ET
+    info = {'filepath':filepath, 'text':None, 'word_count':0, 'confidence_count':0,
+            'mean_confidence':None, 'min_confidence':None, 'error':''}
+    lines = []
+    words = []
+    total = 0.0
+    minimum = None
+    try:
+        for event, elem in ET.iterparse(filepath, events=('end',)):
+            # ignore the namespace (alto versions use different namespaces)
+            tag = elem.tag.rsplit('}', 1)[-1]
+            if (tag == 'String'):
+                info['word_count'] = info['word_count'] + 1
+                if (text):
+                    words.append(elem.get('CONTENT', ''))
+                wc = elem.get('WC')
+                if (wc):
+                    wc = float(wc)
+                    info['confidence_count'] = info['confidence_count'] + 1
+                    total = total + wc
+                    minimum = wc if (minimum is None) else min(minimum, wc)
+                elem.clear()
+            elif (tag == 'TextLine'):
+                if (text):
+                    lines.append(' '.join(words))
+                words = []
+                elem.clear()
+            elif (tag == 'TextBlock'):
+                elem.clear()
+    except (OSError, ET.ParseError, ValueError) as error:
+        info['error'] = str(error)
+    if (text):
+        info['text'] = '\n'.join(lines)
+    if (info['confidence_count'] > 0):
+        info['mean_confidence'] = total / info['confidence_count']
+        info['min_confidence'] = minimum
+    return info
+
+def _parse_alto_stats(filepath):
+    """
+    Stream-parse an ALTO XML file, without its text (see '_parse_alto')
+    """
+    return _parse_alto(filepath, text=False)
+
+def extract_alto_text(vendor_inventory_df, text=True, max_workers=None):
+    """
+    Extract the OCR text, word counts, and word confidences (mean and min)
+    of the ALTO files in a vendor inventory, using a pool of processes.
+    Each file is stream-parsed, so memory use does not grow with file size.
+
+    Parameters
+    ----------
+    vendor_inventory_df : DataFrame
+        Vendor inventory with file paths, as output from call to:
+        `create_vendor_inventory(..., path=...)`
+    text : bool (default: True)
+        Include the page text
+    max_workers : int (optional)
+        Maximum number of processes (default: number of CPUs)
+
+    Raise
+    -----
+    KeyError
+        Missing required field: filepath in DataFrame
+
+    Return
+    ------
+    DataFrame
+        One row per ALTO file, indexed like the inventory, with columns:
+        text, word_count, confidence_count, mean_confidence, min_confidence,
+        error. Join to other inventories on drs_id (or filename_stem).
+    """
+    # check for empty inventory
+    if (vendor_inventory_df.empty == True):
+        return pd.DataFrame()
+    # check for required fields
+    if ((not 'filepath' in vendor_inventory_df.columns) or
+        (not 'file_type' in vendor_inventory_df.columns)):
+        raise KeyError('Missing required field: filepath or file_type in DataFrame')
+
+    # get the alto files
+    alto_df = vendor_inventory_df.loc[vendor_inventory_df['file_type'] == 'alto']
+    if (alto_df.empty == True):
+        return pd.DataFrame()
+
+    # parse the files in parallel
+    func = _parse_alto if (text) else _parse_alto_stats
+    results = _map_files(func, alto_df['filepath'].tolist(), max_workers=max_workers)
+
+    # join the results to the inventory
+    results_df = pd.DataFrame.from_records(results, index=alto_df.index).drop(columns=['filepath'])
+    if (not text):
+        results_df = results_df.drop(columns=['text'])
+    columns = [c for c in ['drs_id','filename_stem','filename','filepath'] if c in alto_df.columns]
+    df = alto_df[columns].join(results_df)
+    return df
+
+# version of the table classification heuristics (cached results of other versions are not reused)
+_TABLE_CLASSIFIER_VERSION = 3
+
+# number cells, allowing thousands separators, parentheses, signs, currency and percent
+_NUMBER_REGEX = re.compile(r'^[\(\-\+]?[\$£]?\d[\d,]*(\.\d+)?\)?%?$|^[\(\-\+]?[\$£]?\.\d+\)?%?$')
+
+# years, often used as column headers
+_YEAR_REGEX = re.compile(r'^1[5-9]\d\d$|^20\d\d$')
+
+# cells treated as empty (vendor placeholders for missing values)
+_EMPTY_CELLS = {'', '-', '--', '—', '...', '…', 'nan', 'NaN'}
+
+def _is_number(value):
+    """
+    Test whether a table cell contains a number (e.g., 1,234  (12.5)  -3  45%  $6)
+
+    Parameter
+    ---------
+    value : str
+
+    Return
+    ------
+    bool
+    """
+    return (_NUMBER_REGEX.match(value) is not None)
+
+def _classify_table(filepath):
+    """
+    Read a csv table once and estimate its structure: the number of header
+    rows, the number of index (row label) columns, the ratio of numeric cells,
+    and proposed multilevel_columns, multilevel_rows and computation_ready
+    flags with confidence scores between 0 and 1.
+
+    A table without numeric columns (e.g., a list of ports and countries) has
+    a single label column. A table with body rows wider than its header (e.g.,
+    an unquoted thousands separator, 1,000, read as two cells) is not
+    computation ready, whatever its other cells.
+
+    Parameter
+    ---------
+    filepath : str
+        Full path to csv file
+
+    Return
+    ------
+    dict
+    """
+    import csv
+    import hashlib
+    import io
+    info = {'filepath':filepath, 'md5':None, 'rows':0, 'columns':0, 'header_rows':0,
+            'index_columns':0, 'numeric_ratio':0.0, 'ragged_rows':0,
+            'multilevel_columns':None, 'multilevel_columns_confidence':0.0,
+            'multilevel_rows':None, 'multilevel_rows_confidence':0.0,
+            'computation_ready':None, 'computation_ready_confidence':0.0, 'error':''}
+    try:
+        with open(filepath, 'rb') as fp:
+            data = fp.read()
+    except OSError as error:
+        info['error'] = str(error)
+        return info
+    info['md5'] = hashlib.md5(data).hexdigest()
+
+    # read the cells
+    reader = csv.reader(io.StringIO(data.decode('utf-8-sig', errors='replace')))
+    rows = [row for row in reader if any(cell.strip() for cell in row)]
+    # first cells before stripping, to detect indented row labels
+    labels = [row[0] for row in rows]
+    rows = [[cell.strip() for cell in row] for row in rows]
+    if (len(rows) == 0):
+        info['error'] = 'Empty table'
+        return info
+    # width of each row, without trailing empty cells
+    widths = [max(i + 1 for i, cell in enumerate(row) if cell) for row in rows]
+    ncols = max(len(row) for row in rows)
+    rows = [row + [''] * (ncols - len(row)) for row in rows]
+    info['rows'] = len(rows)
+    info['columns'] = ncols
+
+    # classify each cell: None (empty), True (number), False (text)
+    cells = [[None if (cell in _EMPTY_CELLS) else _is_number(cell) for cell in row] for row in rows]
+    def ratio(values):
+        values = [v for v in values if v is not None]
+        return (sum(values) / len(values)) if (len(values) > 0) else 0.0
+
+    # header rows: the first row, and following rows (up to 10) whose cells
+    # past the first (label) column are mostly text or years (e.g., 1870)
+    header_rows = 1
+    for row in rows[1:10]:
+        values = [cell for cell in row[1:] if (cell not in _EMPTY_CELLS)]
+        if ((len(values) == 0) or
+            (ratio([_is_number(cell) and (_YEAR_REGEX.match(cell) is None) for cell in values]) >= 0.5)):
+            break
+        header_rows = header_rows + 1
+    if (header_rows == len(cells)):
+        # text table: assume a single header row
+        header_rows = 1
+    body = cells[header_rows:]
+    info['header_rows'] = header_rows
+
+    # ragged rows: body rows wider than the header
+    header_width = max(widths[:header_rows])
+    info['ragged_rows'] = sum([1 for width in widths[header_rows:] if (width > header_width)])
+
+    # index columns: leading columns that are mostly text in the body
+    index_columns = 0
+    for col in range(ncols):
+        if ((len(body) == 0) or
+            (ratio([row[col] for row in body]) >= 0.5)):
+            break
+        index_columns = index_columns + 1
+    if (index_columns == ncols):
+        # text table: only the first column labels the rows
+        index_columns = 1
+    info['index_columns'] = index_columns
+
+    # numeric ratio of the body, excluding the index columns
+    body_ratio = ratio([cell for row in body for cell in row[index_columns:]])
+    header_ratio = ratio([_is_number(cell) and (_YEAR_REGEX.match(cell) is None)
+                          for row in rows[:header_rows] for cell in row[1:] if (cell not in _EMPTY_CELLS)])
+    info['numeric_ratio'] = body_ratio
+
+    # multilevel columns: more than one header row
+    # confidence: how clearly the header rows are separated from the body
+    separation = max(0.0, min(1.0, body_ratio - header_ratio))
+    info['multilevel_columns'] = (header_rows > 1)
+    info['multilevel_columns_confidence'] = separation
+
+    # multilevel rows: more than one index column, or nested row labels
+    # (an empty first label followed by a second label, or indented labels)
+    nested = 0
+    for row, label in zip(rows[header_rows:], labels[header_rows:]):
+        if (((row[0] == '') and (ncols > 1) and (row[1] != '')) or
+            (label.startswith(('  ', '\t', '.', '—')))):
+            nested = nested + 1
+    nested_ratio = nested / max(len(body), 1)
+    score = max(0.8 if (index_columns > 1) else 0.0, min(1.0, 4 * nested_ratio))
+    info['multilevel_rows'] = (score >= 0.5)
+    info['multilevel_rows_confidence'] = abs(score - 0.5) * 2
+
+    # computation ready: single header row, mostly numbers, no nested row labels,
+    # and no ragged rows
+    score = body_ratio * (1.0 if (header_rows == 1) else 0.3) * (1.0 - 0.7 * score)
+    if (info['ragged_rows'] > 0):
+        score = 0.0
+    info['computation_ready'] = (score >= 0.5)
+    info['computation_ready_confidence'] = abs(score - 0.5) * 2
+    return info
+
+def classify_vendor_tables(vendor_inventory_df, cache=None, max_workers=None):
+    """
+    Propose the multilevel_columns, multilevel_rows, and computation_ready
+    flags of the csv files in a vendor inventory, with confidence scores
+    (0 to 1), for review during manual QC. Each file is read once, in a pool
+    of processes. Results are cached by file hash, so unchanged files are
+    not read again on later runs (unless the heuristics change).
+
+    Parameters
+    ----------
+    vendor_inventory_df : DataFrame
+        Vendor inventory with file paths, as output from call to:
+        `create_vendor_inventory(..., path=...)`
+    cache : str (optional)
+        Full path to JSON cache file
+    max_workers : int (optional)
+        Maximum number of processes (default: number of CPUs)
+
+    Raise
+    -----
+    KeyError
+        Missing required field: filepath in DataFrame
+
+    Return
+    ------
+    DataFrame
+        One row per csv file, indexed like the inventory, with the estimated
+        header rows, index columns, numeric ratio, and proposed flags
+    """
+    # check for empty inventory
+    if (vendor_inventory_df.empty == True):
+        return pd.DataFrame()
+    # check for required fields
+    if ((not 'filepath' in vendor_inventory_df.columns) or
+        (not 'file_type' in vendor_inventory_df.columns)):
+        raise KeyError('Missing required field: filepath or file_type in DataFrame')
+
+    # get the csv files
+    csv_df = vendor_inventory_df.loc[vendor_inventory_df['file_type'] == 'csv']
+    if (csv_df.empty == True):
+        return pd.DataFrame()
+
+    import os
+
+    # load the cache: results keyed on file hash, and file hashes keyed on path, size and mtime
+    cached = {'version':_TABLE_CLASSIFIER_VERSION, 'results':{}, 'files':{}}
+    if (cache and os.path.exists(cache)):
+        with open(cache) as fp:
+            doc = json.loads(fp.read())
+        if (doc.get('version') == _TABLE_CLASSIFIER_VERSION):
+            cached = doc
+
+    # find the files whose results are not cached
+    filepaths = csv_df['filepath'].tolist()
+    stats = {}
+    todo = []
+    for filepath in set(filepaths):
+        try:
+            status = os.stat(filepath)
+            stats[filepath] = [status.st_size, status.st_mtime_ns]
+        except OSError:
+            stats[filepath] = None
+        entry = cached['files'].get(filepath)
+        if ((entry is None) or
+            (entry[:2] != stats[filepath]) or
+            (entry[2] not in cached['results'])):
+            todo.append(filepath)
+
+    # classify the files in parallel
+    results = {}
+    for info in _map_files(_classify_table, todo, max_workers=max_workers):
+        results[info['filepath']] = info
+        if (info['md5'] and (not info['error'])):
+            cached['results'][info['md5']] = {k:v for k, v in info.items() if (k != 'filepath')}
+            cached['files'][info['filepath']] = stats[info['filepath']] + [info['md5']]
+    for filepath in filepaths:
+        if (filepath not in results):
+            info = dict(cached['results'][cached['files'][filepath][2]])
+            info['filepath'] = filepath
+            results[filepath] = info
+
+    # save the cache
+    if (cache):
+        with open(cache, 'w') as fp:
+            fp.write(json.dumps(cached))
+
+    # join the results to the inventory
+    results_df = pd.DataFrame.from_records([results[filepath] for filepath in filepaths],
+                                           index=csv_df.index).drop(columns=['filepath'])
+    columns = [c for c in ['drs_id','filename_stem','filename','filepath'] if c in csv_df.columns]
+    df = csv_df[columns].join(results_df)
+    return df
+
+def _read_text(filepath):
+    """
+    Read a text file (e.g., a vendor txt transcription)
+
+    Parameter
+    ---------
+    filepath : str
+
+    Return
+    ------
+    dict
+        {filepath, text, error}
+    """
+    try:
+        with open(filepath, encoding='utf-8', errors='replace') as fp:
+            return {'filepath':filepath, 'text':fp.read(), 'error':''}
+    except OSError as error:
+        return {'filepath':filepath, 'text':None, 'error':str(error)}
+
+def index_transcriptions(vendor_inventory_df, database, alto=False, batch_size=1000, max_workers=None):
+    """
+    Load the txt (and optionally ALTO) transcriptions of a vendor inventory
+    into an on-disk SQLite full-text (FTS5) index. Updates are incremental:
+    files whose size and modification time are unchanged since they were
+    indexed are not read again, and files that no longer exist are removed.
+    Files of other inventories already in the index are kept, so several
+    deliveries can share one index.
+
+    Parameters
+    ----------
+    vendor_inventory_df : DataFrame
+        Vendor inventory with file paths, as output from call to:
+        `create_vendor_inventory(..., path=...)` or `map_drs_vendor_inventory`
+    database : str
+        Full path to SQLite index file (created if needed)
+    alto : bool (default: False)
+        Also index the text of ALTO files
+    batch_size : int (default: 1000)
+        Number of files read and written at a time
+    max_workers : int (optional)
+        Maximum number of processes parsing ALTO files (default: number of CPUs)
+
+    Raise
+    -----
+    KeyError
+        Missing required field: filepath or file_type in DataFrame
+
+    Return
+    ------
+    dict
+        Number of files: {indexed, unchanged, removed, errors}
+    """
+    counts = {'indexed':0, 'unchanged':0, 'removed':0, 'errors':0}
+    # check for empty inventory
+    if (vendor_inventory_df.empty == True):
+        return counts
+    # check for required fields
+    if ((not 'filepath' in vendor_inventory_df.columns) or
+        (not 'file_type' in vendor_inventory_df.columns)):
+        raise KeyError('Missing required field: filepath or file_type in DataFrame')
+
+    import os
+    import sqlite3
+
+    # get the transcriptions
+    file_types = ['txt', 'alto'] if (alto) else ['txt']
+    columns = ['drs_id', 'filename_osn', 'filename', 'file_type', 'filepath']
+    df = vendor_inventory_df.loc[vendor_inventory_df['file_type'].isin(file_types)].reindex(columns=columns)
+    df = df.astype(object).where(df.notna(), None).drop_duplicates('filepath')
+
+    connection = sqlite3.connect(database)
+    try:
+        connection.execute('CREATE VIRTUAL TABLE IF NOT EXISTS transcriptions USING fts5('
+                           'text, drs_id UNINDEXED, filename_osn UNINDEXED, filename UNINDEXED, '
+                           'file_type UNINDEXED, filepath UNINDEXED)')
+        connection.execute('CREATE TABLE IF NOT EXISTS files ('
+                           'filepath TEXT PRIMARY KEY, doc_id INTEGER, size INTEGER, mtime_ns INTEGER)')
+        indexed = {row[0]:(row[1], row[2], row[3]) for row in
+                   connection.execute('SELECT filepath, doc_id, size, mtime_ns FROM files')}
+
+        # find the files that are new or changed, and remove the files that no longer exist
+        todo = []
+        removed = []
+        for row in df.itertuples(index=False):
+            try:
+                status = os.stat(row.filepath)
+            except OSError:
+                if (row.filepath in indexed):
+                    removed.append(row.filepath)
+                else:
+                    counts['errors'] = counts['errors'] + 1
+                continue
+            entry = indexed.get(row.filepath)
+            if ((entry is not None) and
+                (entry[1:] == (status.st_size, status.st_mtime_ns))):
+                counts['unchanged'] = counts['unchanged'] + 1
+                continue
+            todo.append((row, status.st_size, status.st_mtime_ns))
+        with connection:
+            for filepath in removed:
+                connection.execute('DELETE FROM transcriptions WHERE rowid = ?', (indexed[filepath][0],))
+                connection.execute('DELETE FROM files WHERE filepath = ?', (filepath,))
+        counts['removed'] = len(removed)
+
+        # read and index the files in batches, one transaction per batch
+        for start in range(0, len(todo), batch_size):
+            batch = todo[start:start + batch_size]
+            txt = [row.filepath for row, size, mtime_ns in batch if (row.file_type == 'txt')]
+            xml = [row.filepath for row, size, mtime_ns in batch if (row.file_type == 'alto')]
+            texts = {info['filepath']:info for info in [_read_text(filepath) for filepath in txt]}
+            if (len(xml) > 0):
+                texts.update({info['filepath']:info for info in _map_files(_parse_alto, xml, max_workers=max_workers)})
+            with connection:
+                for row, size, mtime_ns in batch:
+                    info = texts[row.filepath]
+                    if (info['error']):
+                        counts['errors'] = counts['errors'] + 1
+                        continue
+                    entry = indexed.get(row.filepath)
+                    if (entry is not None):
+                        connection.execute('DELETE FROM transcriptions WHERE rowid = ?', (entry[0],))
+                    cursor = connection.execute('INSERT INTO transcriptions (text, drs_id, filename_osn, filename, '
+                                                'file_type, filepath) VALUES (?, ?, ?, ?, ?, ?)',
+                                                (info['text'], row.drs_id, row.filename_osn, row.filename,
+                                                 row.file_type, row.filepath))
+                    connection.execute('INSERT OR REPLACE INTO files (filepath, doc_id, size, mtime_ns) '
+                                       'VALUES (?, ?, ?, ?)', (row.filepath, cursor.lastrowid, size, mtime_ns))
+                    counts['indexed'] = counts['indexed'] + 1
+    finally:
+        connection.close()
+    return counts
+
+def search_transcriptions(database, query, limit=100):
+    """
+    Search the transcriptions of an index created by 'index_transcriptions'
+
+    Parameters
+    ----------
+    database : str
+        Full path to SQLite index file
+    query : str
+        SQLite FTS5 query (e.g., 'Liverpool', 'cotton AND Bombay', '"raw cotton"', 'export*')
+    limit : int (default: 100)
+        Maximum number of pages
+
+    Raise
+    -----
+    ValueError
+        Invalid query (e.g., 'cotton AND')
+    FileNotFoundError
+        Index file not found
+
+    Return
+    ------
+    DataFrame
+        One row per page, best match first, with columns: drs_id, filename_osn,
+        filename, file_type, filepath, rank (bm25, lower is better), snippet
+    """
+    import os
+    import sqlite3
+    if (not os.path.exists(database)):
+        raise FileNotFoundError('Index file not found: {}'.format(database))
+    connection = sqlite3.connect(database)
+    try:
+        cursor = connection.execute('SELECT drs_id, filename_osn, filename, file_type, filepath, '
+                                    'bm25(transcriptions) AS rank, '
+                                    "snippet(transcriptions, 0, '[', ']', '...', 12) AS snippet "
+                                    'FROM transcriptions WHERE transcriptions MATCH ? ORDER BY rank LIMIT ?',
+                                    (query, limit))
+        df = pd.DataFrame(cursor.fetchall(), columns=[column[0] for column in cursor.description])
+    except sqlite3.OperationalError as error:
+        raise ValueError('Invalid query: {!r} ({})'.format(query, error))
+    finally:
+        connection.close()
+    return df
+
+# default gazetteer for 'tag_entities': entity names, keyed on category
+GAZETTEER = {
+    'Treaty Port':['Newchwang', 'Tientsin', 'Chefoo', 'Hankow', 'Kiukiang', 'Chinkiang', 'Shanghai', 'Ningpo',
+                   'Foochow', 'Tamsui', 'Takow', 'Amoy', 'Swatow', 'Canton', 'Kiungchow', 'Pakhoi', 'Ichang',
+                   'Wuhu', 'Wenchow'],
+    'Country':['China', 'Japan', 'Great Britain', 'United States', 'France', 'Germany', 'Russia', 'India', 'Siam',
+               'Spain', 'Holland', 'Denmark', 'Sweden', 'Norway', 'Italy', 'Austria', 'Belgium', 'Portugal', 'Peru',
+               'Hongkong', 'Macao', 'Singapore', 'Straits Settlements', 'Philippine Islands', 'Australia'],
+    'Commodity':['Opium', 'Tea', 'Silk', 'Raw Silk', 'Cotton', 'Raw Cotton', 'Cotton Goods', 'Woollen Goods',
+                 'Sugar', 'Rice', 'Coal', 'Copper', 'Iron', 'Tin', 'Hides', 'Tobacco', 'Paper', 'Porcelain',
+                 'Medicines', 'Rhubarb', 'Camphor', 'Indigo', 'Beans', 'Bean Cake', 'Wheat', 'Ginseng', 'Cassia',
+                 'Silver', 'Gold']
+}
+
+# words of a text, for matching gazetteer entries
+_WORD_REGEX = re.compile(r'\w+')
+
+def _build_gazetteer(gazetteer):
+    """
+    Build a word trie of the entries of a gazetteer, matched without regard to case
+
+    Parameter
+    ---------
+    gazetteer : dict, DataFrame, or str
+        Entity names keyed on category (see GAZETTEER), or a DataFrame (or
+        full path to a csv file) with a term column and optional entity
+        (name reported for the term, default: term) and category columns
+
+    Raise
+    -----
+    KeyError
+        Missing required field: term in gazetteer
+
+    Return
+    ------
+    dict
+        Nested dict keyed on (lower case) word; the (entity name, category) of
+        a complete entry is kept under the None key (category: None, if none)
+    """
+    if (isinstance(gazetteer, dict)):
+        terms = [(term, term, category) for category, names in gazetteer.items() for term in names]
+    else:
+        df = pd.read_csv(gazetteer, dtype=str) if (isinstance(gazetteer, str)) else gazetteer
+        if (not 'term' in df.columns):
+            raise KeyError('Missing required field: term in gazetteer')
+        entities = df['entity'].fillna(df['term']) if ('entity' in df.columns) else df['term']
+        categories = [None] * len(df)
+        if ('category' in df.columns):
+            categories = df['category'].astype(object).where(df['category'].notna(), None)
+        terms = list(zip(df['term'], entities, categories))
+    trie = {}
+    for term, entity, category in terms:
+        words = _WORD_REGEX.findall(str(term).lower())
+        if (len(words) == 0):
+            continue
+        node = trie
+        for word in words:
+            node = node.setdefault(word, {})
+        node[None] = (entity, category)
+    return trie
+
+def _find_entities(text, trie):
+    """
+    Find the gazetteer entities in a text, in one pass over its words.
+    Overlapping entries are resolved leftmost-longest (e.g., Raw Silk, not Silk).
+
+    Parameters
+    ----------
+    text : str
+    trie : dict
+        Output of '_build_gazetteer'
+
+    Return
+    ------
+    list
+        (entity name, category) tuples, in order of first occurrence (without repeats)
+    """
+    words = _WORD_REGEX.findall(text.lower())
+    found = {}
+    i = 0
+    while (i < len(words)):
+        node = trie.get(words[i])
+        match = None
+        j = i
+        while (node is not None):
+            j = j + 1
+            if (None in node):
+                match = (node[None], j)
+            node = node.get(words[j]) if (j < len(words)) else None
+        if (match):
+            found.setdefault(match[0], None)
+            i = match[1]
+        else:
+            i = i + 1
+    return list(found.keys())
+
+def _tag_file(filepath, trie):
+    """
+    Find the gazetteer entities in a txt or ALTO transcription (see 'tag_entities')
+
+    Parameters
+    ----------
+    filepath : str
+        Full path to txt or ALTO (.xml) file
+    trie : dict
+        Output of '_build_gazetteer'
+
+    Return
+    ------
+    dict
+        {filepath, entities (list of (entity name, category)), error}
+    """
+    info = _parse_alto(filepath) if (filepath.lower().endswith('.xml')) else _read_text(filepath)
+    entities = _find_entities(info['text'], trie) if (not info['error']) else []
+    return {'filepath':filepath, 'entities':entities, 'error':info['error']}
+
+def tag_entities(vendor_inventory_df, gazetteer=None, alto=False, max_workers=None):
+    """
+    Tag the txt (and optionally ALTO) transcriptions of a vendor inventory with
+    the entities of a gazetteer (e.g., treaty ports, countries, commodities),
+    using a pool of processes. Each file is read once and its words are matched
+    against all the gazetteer entries at once, without regard to case.
+
+    Parameters
+    ----------
+    vendor_inventory_df : DataFrame
+        Vendor inventory with file paths, as output from call to:
+        `create_vendor_inventory(..., path=...)` or `map_drs_vendor_inventory`
+    gazetteer : dict, DataFrame, or str (optional)
+        Entity names keyed on category (default: GAZETTEER), or a DataFrame (or
+        full path to a csv file) with a term column and optional entity (name
+        reported for the term) and category columns
+    alto : bool (default: False)
+        Also tag the text of ALTO files
+    max_workers : int (optional)
+        Maximum number of processes (default: number of CPUs)
+
+    Raise
+    -----
+    KeyError
+        Missing required field: drs_id, filename, filepath or file_type in DataFrame
+
+    Return
+    ------
+    DataFrame
+        One row per DRS id: drs_id, filename (of its first transcription),
+        filename_osn (if in the inventory), entities (names, separated by ;,
+        None if none), categorized_entities (as Category:Name, or Name if the
+        entry has no category, separated by ;, None if none), and errors
+        (files that could not be read, separated by ;)
+    """
+    columns = ['drs_id', 'filename', 'filename_osn', 'entities', 'categorized_entities', 'errors']
+    # check for empty inventory
+    if (vendor_inventory_df.empty == True):
+        return pd.DataFrame(columns=columns)
+    # check for required fields
+    for column in ['drs_id', 'filename', 'filepath', 'file_type']:
+        if (not column in vendor_inventory_df.columns):
+            raise KeyError('Missing required field: {} in DataFrame'.format(column))
+
+    import functools
+
+    # get the transcriptions
+    file_types = ['txt', 'alto'] if (alto) else ['txt']
+    df = vendor_inventory_df.loc[vendor_inventory_df['file_type'].isin(file_types)]
+    if ('filename_osn' not in df.columns):
+        columns.remove('filename_osn')
+    df = df.drop_duplicates('filepath')
+
+    # tag the files
+    trie = _build_gazetteer(GAZETTEER if (gazetteer is None) else gazetteer)
+    results = _map_files(functools.partial(_tag_file, trie=trie), df['filepath'].tolist(), max_workers=max_workers)
+
+    # combine the entities of the transcriptions of each page
+    rows = {}
+    for row, result in zip(df.itertuples(index=False), results):
+        page = rows.get(row.drs_id)
+        if (page is None):
+            page = {'drs_id':row.drs_id, 'filename':row.filename, 'entities':{}, 'errors':[]}
+            if ('filename_osn' in columns):
+                page['filename_osn'] = row.filename_osn
+            rows[row.drs_id] = page
+        page['entities'].update(dict.fromkeys(result['entities']))
+        if (result['error']):
+            page['errors'].append(row.filename)
+    for page in rows.values():
+        found = list(page['entities'].keys())
+        page['categorized_entities'] = ';'.join([entity if (category is None) else '{}:{}'.format(category, entity)
+                                                 for entity, category in found]) if (len(found) > 0) else None
+        page['entities'] = ';'.join(dict.fromkeys([entity for entity, category in found])) if (len(found) > 0) else None
+        page['errors'] = ';'.join(page['errors'])
+    return pd.DataFrame(list(rows.values()), columns=columns)
+
 
 # end file